@@ -0,0 +1,370 @@
+"""
+Native asyncio variant of ConfluenceBot.
+
+`AsyncConfluenceBot` exposes the same pipeline as `ConfluenceBot` through
+coroutines (`achat`, `afetch_confluence_page_by_id`, `asearch_confluence_pages`,
+...). DeepSeek is called through `AsyncOpenAI` and the Confluence REST API
+through `httpx.AsyncClient`, so a conversation waiting on I/O holds no thread
+and one event loop can serve thousands of conversations concurrently.
+
+Routing, prompt building, caching and extraction are inherited unchanged from
+`ConfluenceBot`; HTML extraction runs in a worker thread so large pages do not
+stall the loop. Both async clients are safe to share between bots - pass them in
+to let every conversation use one connection pool.
+
+Concurrent fetches of the same page are coalesced: when many conversations ask
+for an uncached page at once, one request is made and all of them share it.
+Confluence requests share the process-wide `confluence_limiter` with the
+threaded bot, so both back off together when Confluence throttles.
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from chatbot import ConfluenceBot
+from model_routing import SECTION_NOTES, model_router
+from rate_limiter import (ADAPTIVE_LIMIT_ENABLED, MAX_RETRIES, THROTTLE_STATUSES, confluence_limiter,
+                          retry_after_seconds)
+import profiling
+
+
+class AsyncConfluenceClient:
+    """The Confluence REST calls ConfluenceBot makes, over one pooled httpx.AsyncClient"""
+
+    def __init__(self, url: str, username: Optional[str], password: Optional[str],
+                 max_connections: int = 100, timeout: float = 30.0):
+        import httpx
+
+        self.url = url.rstrip('/')
+        self._client = httpx.AsyncClient(
+            base_url=self.url,
+            auth=(username, password) if username else None,
+            headers={'Accept': 'application/json'},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout
+        )
+
+    async def _get(self, path: str, **params) -> Optional[Dict]:
+        params = {key: value for key, value in params.items() if value is not None}
+        for attempt in range(MAX_RETRIES + 1):
+            if not ADAPTIVE_LIMIT_ENABLED:
+                response = await self._client.get(path, params=params)
+                break
+            async with confluence_limiter.aslot():
+                response = await self._client.get(path, params=params)
+            confluence_limiter.on_response(response.status_code, response.headers)
+            if response.status_code not in THROTTLE_STATUSES or attempt == MAX_RETRIES:
+                break
+            await asyncio.sleep(retry_after_seconds(response.headers, 2 ** attempt))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def get_page_by_title(self, space: str, title: str, expand: Optional[str] = None) -> Optional[Dict]:
+        data = await self._get('/rest/api/content', spaceKey=space, title=title, type='page', expand=expand)
+        results = (data or {}).get('results') or []
+        return results[0] if results else None
+
+    async def get_page_by_id(self, page_id: str, expand: Optional[str] = None) -> Optional[Dict]:
+        return await self._get(f'/rest/api/content/{page_id}', expand=expand)
+
+    async def cql(self, cql: str, limit: int = 5) -> Dict:
+        return await self._get('/rest/api/search', cql=cql, limit=limit) or {}
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def create_async_confluence() -> Optional[AsyncConfluenceClient]:
+    """Async Confluence client from the CONFLUENCE_* environment, or None if not configured"""
+    if not (os.environ.get("CONFLUENCE_URL") and os.environ.get("CONFLUENCE_USERNAME")):
+        return None
+    return AsyncConfluenceClient(
+        os.environ["CONFLUENCE_URL"],
+        os.environ.get("CONFLUENCE_USERNAME"),
+        os.environ.get("CONFLUENCE_PASSWORD"),  # or API token
+        max_connections=int(os.environ.get("CONFLUENCE_MAX_CONNECTIONS", 100))
+    )
+
+
+def create_async_deepseek():
+    """AsyncOpenAI client for DeepSeek, or None if DEEPSEEK_API_KEY is not set"""
+    if not os.environ.get("DEEPSEEK_API_KEY"):
+        return None
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=os.environ.get("DEEPSEEK_API_KEY"), base_url="https://api.deepseek.com")
+
+
+# Page fetches in flight, by cache key, shared by all bots on the event loop
+_inflight_fetches: Dict[str, 'asyncio.Future'] = {}
+
+
+class AsyncConfluenceBot(ConfluenceBot):
+    """ConfluenceBot whose network I/O is awaited instead of blocking a thread"""
+
+    def __init__(self, name: str = "ConfluenceBot", use_llm: bool = True, page_cache=None,
+                 async_confluence: Optional[AsyncConfluenceClient] = None, async_deepseek=None):
+        super().__init__(name, use_llm=use_llm, page_cache=page_cache)
+        self._async_confluence = async_confluence
+        self._async_deepseek = async_deepseek
+
+    @property
+    def async_confluence(self) -> Optional[AsyncConfluenceClient]:
+        """Async Confluence client, constructed on first access"""
+        if self._async_confluence is None and self.confluence_enabled():
+            try:
+                self._async_confluence = create_async_confluence()
+            except Exception as e:
+                print(f"Warning: Could not initialize async Confluence client: {e}")
+        return self._async_confluence
+
+    @property
+    def async_deepseek_client(self):
+        """AsyncOpenAI client for DeepSeek, constructed on first access"""
+        if self._async_deepseek is None and self.deepseek_enabled():
+            try:
+                self._async_deepseek = create_async_deepseek()
+            except Exception as e:
+                print(f"Warning: Could not initialize async DeepSeek client: {e}")
+        return self._async_deepseek if self.use_llm else None
+
+    async def _coalesced_fetch(self, cache_key: str, fetch: Callable[[], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        """Run `fetch` once per cache key however many bots ask concurrently"""
+        task = _inflight_fetches.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            _inflight_fetches[cache_key] = task
+            task.add_done_callback(lambda _: _inflight_fetches.pop(cache_key, None))
+            return await asyncio.shield(task)
+
+        # Another bot is fetching this page; share its result and cache it here too
+        page_data = await asyncio.shield(task)
+        if page_data:
+            self._cache_page(cache_key, page_data)
+        return page_data
+
+    async def afetch_confluence_page_by_title(self, space_key: str, page_title: str) -> Optional[Dict]:
+        """Fetch a Confluence page by space key and title"""
+        snapshot_page = self.load_page_from_snapshot(f"{space_key}:{page_title}")
+        if snapshot_page:
+            return snapshot_page
+
+        if not self.async_confluence:
+            return None
+
+        return await self._coalesced_fetch(f"{space_key}:{page_title}",
+                                           lambda: self._afetch_by_title(space_key, page_title))
+
+    async def _afetch_by_title(self, space_key: str, page_title: str) -> Optional[Dict]:
+        try:
+            page = await self.async_confluence.get_page_by_title(space_key, page_title, expand='body.storage,version')
+            if page:
+                content = await asyncio.to_thread(self.extract_page_content, page)
+                page_data = self.page_data_from_api(page, content, space_key)
+                self._cache_page(f"{space_key}:{page_title}", page_data)
+                return page_data
+        except Exception as e:
+            print(f"Error fetching Confluence page: {e}")
+            return None
+
+    async def afetch_confluence_page_by_id(self, page_id: str) -> Optional[Dict]:
+        """Fetch a Confluence page by ID"""
+        snapshot_page = self.load_page_from_snapshot(f"id:{page_id}")
+        if snapshot_page:
+            return snapshot_page
+
+        if not self.async_confluence:
+            return None
+
+        return await self._coalesced_fetch(f"id:{page_id}", lambda: self._afetch_by_id(page_id))
+
+    async def _afetch_by_id(self, page_id: str) -> Optional[Dict]:
+        try:
+            page = await self.async_confluence.get_page_by_id(page_id, expand='body.storage,space,version')
+            if page:
+                content = await asyncio.to_thread(self.extract_page_content, page)
+                page_data = self.page_data_from_api(page, content)
+                self._cache_page(f"id:{page_id}", page_data)
+                return page_data
+        except Exception as e:
+            print(f"Error fetching Confluence page by ID: {e}")
+            return None
+
+    async def asearch_confluence_pages(self, query: str, space_key: str = None) -> List[Dict]:
+        """Search for Confluence pages"""
+        if not self.async_confluence:
+            return []
+
+        try:
+            results = await self.async_confluence.cql(self.build_search_cql(query, space_key), limit=5)
+            return self.parse_search_results(results)
+        except Exception as e:
+            print(f"Error searching Confluence: {e}")
+            return []
+
+    async def aload_page_from_reference(self, page_reference: str) -> Optional[Dict]:
+        """Load a page from a reference (title or ID)"""
+        cached_page = self.confluence_content_cache.find(page_reference)
+        if cached_page:
+            return cached_page
+
+        if page_reference.isdigit():
+            return await self.afetch_confluence_page_by_id(page_reference)
+
+        # The title catalog lists spaces with the sync client, at most once per refresh interval
+        if self.title_index_enabled and await asyncio.to_thread(self.title_catalog_ready):
+            match = self.resolve_page_title(page_reference)
+            page_data = await self.afetch_confluence_page_by_id(match.page_id) if match else None
+            if page_data:
+                return page_data
+
+        # Look the title up in every space at once; the first space in CONFLUENCE_SPACES wins
+        results = await asyncio.gather(*(
+            self.afetch_confluence_page_by_title(space_key, page_reference) for space_key in self.confluence_spaces()
+        ))
+        return next((page_data for page_data in results if page_data), None)
+
+    async def aget_confluence_context(self, message: str) -> str:
+        """Get relevant Confluence content for the current message"""
+        page_mention = self.extract_page_reference(message)
+        page_data = await self.aload_page_from_reference(page_mention) if page_mention else None
+        return self.build_confluence_context(message, page_data)
+
+    async def aget_relevant_pages(self, message: str) -> List[Dict]:
+        """Pages a question is about: the referenced page plus recently loaded pages"""
+        page_mention = self.extract_page_reference(message)
+        page_data = await self.aload_page_from_reference(page_mention) if page_mention else None
+        return self.collect_relevant_pages(page_data)
+
+    async def aextract_section_notes(self, message: str, title: str, section: str) -> Optional[str]:
+        """Map step: pull out what one section says about the question"""
+        try:
+            start, response = time.perf_counter(), None
+            try:
+                response = await self.async_deepseek_client.chat.completions.create(
+                    **self.section_notes_request(message, title, section)
+                )
+            finally:
+                model_router.record(SECTION_NOTES, time.perf_counter() - start, getattr(response, 'usage', None),
+                                    error=response is None)
+            notes = response.choices[0].message.content.strip()
+            return None if notes.upper().startswith("NONE") else notes
+        except Exception as e:
+            print(f"Error extracting section notes: {e}")
+            return None
+
+    async def agenerate_map_reduce_response(self, message: str, pages: List[Dict]) -> Optional[str]:
+        """Answer over long or multiple pages: extract notes per section concurrently, then reduce"""
+        if not self.async_deepseek_client:
+            return None
+
+        sections = self.split_into_sections(pages)
+        semaphore = asyncio.Semaphore(max(1, self.map_reduce_max_workers))
+
+        async def extract(title: str, section: str) -> Optional[str]:
+            async with semaphore:
+                return await self.aextract_section_notes(message, title, section)
+
+        notes = await asyncio.gather(*(extract(title, section) for title, section in sections))
+        return await self.agenerate_deepseek_response(message, confluence_context=self.map_reduce_context(sections, notes, pages))
+
+    async def agenerate_deepseek_response(self, message: str, confluence_context: Optional[str] = None) -> Optional[str]:
+        """Generate response using DeepSeek LLM"""
+        if not self.async_deepseek_client:
+            return None
+
+        try:
+            if confluence_context is None:
+                confluence_context = await self.aget_confluence_context(message)
+
+            policy, request = self.answer_request(message, confluence_context)
+            start, response = time.perf_counter(), None
+            try:
+                response = await self.async_deepseek_client.chat.completions.create(**request)
+            finally:
+                model_router.record(policy, time.perf_counter() - start, getattr(response, 'usage', None),
+                                    error=response is None)
+
+            return response.choices[0].message.content.strip()
+
+        except Exception as e:
+            print(f"Error generating DeepSeek response: {e}")
+            return None
+
+    async def ahandle_confluence_command(self, message: str) -> Optional[str]:
+        """Handle specific Confluence commands"""
+        command = self.parse_confluence_command(message)
+        if not command:
+            return None
+
+        action, argument = command
+        if action == 'load':
+            return self.format_load_result(argument, await self.aload_page_from_reference(argument))
+        return self.format_search_results(argument, await self.asearch_confluence_pages(argument))
+
+    async def agenerate_fallback_response(self, message: str) -> str:
+        """Generate fallback response using pattern matching"""
+        potential_name = self.get_user_name(message)
+        if potential_name:
+            self.user_name = potential_name
+            return f"Nice to meet you, {self.user_name}! I can help you with Confluence pages and answer questions about your documentation. What would you like to know?"
+
+        confluence_response = await self.ahandle_confluence_command(message)
+        if confluence_response:
+            return confluence_response
+
+        return self.generate_pattern_response(message)
+
+    async def agenerate_response(self, message: str) -> str:
+        """Generate an appropriate response based on the message"""
+        potential_name = self.get_user_name(message)
+        if potential_name:
+            self.user_name = potential_name
+
+        # Answer trivial turns locally without a network call when we are confident
+        route = self.fast_path_route(message)
+        if route:
+            if route == 'command':
+                response = await self.ahandle_confluence_command(message)
+            else:
+                response = await self.agenerate_fallback_response(message)
+            if response:
+                self.route_counts[route] += 1
+                return response
+        self.route_counts['llm'] += 1
+
+        # Handle page loading automatically if page reference is detected
+        page_ref = self.extract_page_reference(message)
+        if page_ref and not self.confluence_content_cache.find(page_ref):
+            page_data = await self.aload_page_from_reference(page_ref)
+            if page_data:
+                message += f" (I've loaded the page '{page_data['title']}' for context)"
+
+        if self.async_deepseek_client:
+            relevant_pages = await self.aget_relevant_pages(message) if self.map_reduce_enabled else []
+            if self.needs_map_reduce(message, relevant_pages):
+                llm_response = await self.agenerate_map_reduce_response(message, relevant_pages)
+            else:
+                llm_response = await self.agenerate_deepseek_response(message)
+            if llm_response:
+                return llm_response
+
+        return await self.agenerate_fallback_response(message)
+
+    async def achat(self, message: str) -> str:
+        """Main chat coroutine that processes a message and returns a response
+
+        Per-request profiling is not available here: concurrent conversations share
+        the event loop thread, so its samples could not be attributed to one request.
+        """
+        message, _ = profiling.strip_debug_flag(message)
+        if not message.strip():
+            return "I didn't catch that. Could you say something? You can ask me about Confluence pages!"
+
+        turn = self.start_turn(message)
+        turn['bot'] = await self.agenerate_response(message)
+        return turn['bot']
+
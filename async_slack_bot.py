@@ -0,0 +1,248 @@
+"""
+Asyncio Slack entry point.
+
+Runs `AsyncConfluenceBot` under a slack_bolt `AsyncApp`: every conversation is a
+coroutine instead of a thread, and all of them share one pooled Confluence
+client and one AsyncOpenAI client, so a single process can hold thousands of
+concurrent conversations. Supports the HTTP events endpoint (served by aiohttp
+together with /health and /confluence/webhook) and Socket Mode.
+
+Usage:
+    python async_slack_bot.py            # SLACK_TRANSPORT=http (default) or socket
+"""
+
+import asyncio
+import os
+import re
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from slack_bolt.async_app import AsyncApp
+
+from async_chatbot import AsyncConfluenceBot, create_async_confluence, create_async_deepseek
+from model_routing import model_router
+from rate_limiter import background_priority, confluence_limiter
+from slack_bot import SlackChatBot
+from title_index import title_catalog
+
+# Load environment variables
+load_dotenv()
+
+
+class AsyncSlackChatBot(SlackChatBot):
+    """SlackChatBot on an AsyncApp; per-user state, invalidation and latency tracking are shared"""
+
+    def __init__(self):
+        self.app = AsyncApp(
+            token=os.environ.get("SLACK_BOT_TOKEN"),
+            signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
+        )
+        self._init_state()
+        self.user_locks: Dict[str, asyncio.Lock] = {}
+        # The loop serving the app; webhook invalidations are handed to it from the debounce thread
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # One connection pool per service for every conversation
+        self.async_confluence = create_async_confluence()
+        self.async_deepseek = create_async_deepseek()
+
+        self._setup_handlers()
+
+    def _get_user_bot(self, user_id: str) -> AsyncConfluenceBot:
+        """Get or create the bot for a user (called on the event loop only)"""
+        if user_id not in self.user_bots:
+            self.user_bots[user_id] = AsyncConfluenceBot(
+                "SlackBot",
+                async_confluence=self.async_confluence,
+                async_deepseek=self.async_deepseek
+            )
+            self.user_locks[user_id] = asyncio.Lock()
+        return self.user_bots[user_id]
+
+    def invalidate_confluence_page(self, page_id: str, page_exists: bool = True):
+        """Called from the webhook debounce thread: run the invalidation on the event loop"""
+        if self.loop is None or self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.ainvalidate_confluence_page(page_id, page_exists), self.loop)
+
+    async def ainvalidate_confluence_page(self, page_id: str, page_exists: bool = True):
+        """Invalidate a page in every conversation's cache; refresh it once if it still exists"""
+        holders = self.evict_confluence_page(page_id, page_exists)
+        if not page_exists:
+            return
+        with background_priority():
+            if holders:
+                refreshed = await holders[0].afetch_confluence_page_by_id(page_id)
+                if refreshed:
+                    for bot in holders[1:]:
+                        bot.confluence_content_cache[f"id:{page_id}"] = refreshed
+            elif page_id in title_catalog:
+                # Nobody has the page cached, but a rename or move must still reach the title catalog
+                bot = next(iter(self.user_bots.values()), None)
+                try:
+                    page = await bot.async_confluence.get_page_by_id(page_id, expand='space') \
+                        if bot and bot.async_confluence else None
+                except Exception as e:
+                    print(f"Warning: Could not refresh the title of page {page_id}: {e}")
+                    return
+                if page:
+                    title_catalog.add(page_id, page['title'], page.get('space', {}).get('key', ''))
+
+    async def _achat(self, user_id: str, text: str) -> str:
+        """Answer a user's message; messages from the same user are handled one at a time"""
+        user_bot = self._get_user_bot(user_id)
+        async with self.user_locks[user_id]:
+            return await user_bot.achat(text)
+
+    def _setup_handlers(self):
+        """Set up Slack event handlers"""
+
+        @self.app.message(re.compile(".*"))
+        async def handle_message(message, say):
+            response = await self._achat(message['user'], message['text'])
+            await say(response)
+            self._record_latency(message.get('ts'))
+
+        @self.app.event("app_mention")
+        async def handle_app_mention(event, say):
+            text = re.sub(r'<@\w+>', '', event['text']).strip()
+            response = await self._achat(event['user'], text)
+            await say(response)
+            self._record_latency(event.get('ts'))
+
+        @self.app.event("app_home_opened")
+        async def handle_app_home_opened(client, event):
+            try:
+                await client.views_publish(user_id=event["user"], view=self.home_view())
+            except Exception as e:
+                print(f"Error publishing home view: {e}")
+
+        @self.app.command("/chat")
+        async def handle_chat_command(ack, respond, command):
+            await ack()
+            response = await self._achat(command['user_id'], command['text'])
+            await respond(f"🤖 {response}")
+
+    def web_app(self, port: int = 3000):
+        """aiohttp application with the Slack events endpoint plus health, webhook and index routes"""
+        from aiohttp import web
+
+        web_app = self.app.web_app(path="/slack/events", port=port)
+
+        async def health_check(request):
+            return web.json_response({
+                "status": "healthy",
+                "bot": "SlackBot is running!",
+                "transport": self.transport,
+                "conversations": len(self.user_bots),
+                "reply_latency": self.latency_summary(),
+                "confluence_limiter": confluence_limiter.status(),
+                "model_routes": model_router.summary()
+            })
+
+        async def confluence_webhook(request):
+            body, status = self.handle_confluence_webhook(
+                await request.read(),
+                request.headers.get("X-Hub-Signature"),
+                request.query.get("token"),
+                request.headers.get("X-Event-Key")
+            )
+            return web.json_response(body, status=status)
+
+        async def home(request):
+            return web.json_response({
+                "message": "SlackBot is running!",
+                "endpoints": {
+                    "events": "/slack/events",
+                    "health": "/health",
+                    "confluence_webhook": "/confluence/webhook"
+                }
+            })
+
+        web_app.router.add_get("/health", health_check)
+        web_app.router.add_post("/confluence/webhook", confluence_webhook)
+        web_app.router.add_get("/", home)
+        web_app.on_startup.append(self._capture_loop)
+        web_app.on_cleanup.append(self._aclose)
+        return web_app
+
+    async def _capture_loop(self, web_app=None):
+        self.loop = asyncio.get_running_loop()
+
+    async def _aclose(self, web_app=None):
+        """Close the shared connection pools"""
+        if self.async_confluence:
+            await self.async_confluence.aclose()
+        if self.async_deepseek:
+            await self.async_deepseek.close()
+
+    def run(self, host="0.0.0.0", port=3000, debug=False):
+        """Serve Slack events over HTTP with aiohttp"""
+        from aiohttp import web
+
+        print(f"🤖 SlackBot (asyncio) is starting on {host}:{port}")
+        print(f"📡 Webhook URL: http://{host}:{port}/slack/events")
+        print(f"❤️  Health check: http://{host}:{port}/health")
+
+        try:
+            web.run_app(self.web_app(port), host=host, port=port)
+        finally:
+            self._shutdown()
+
+    def run_socket_mode(self, connections: int = 1, concurrency: int = 10, host="0.0.0.0", port=3000):
+        """Run over Socket Mode; aiohttp keeps serving /health and the Confluence webhook on host:port
+
+        `concurrency` is ignored: every event is handled as a coroutine on the loop.
+        """
+        self.transport = "socket"
+        try:
+            asyncio.run(self._run_socket_mode(max(1, min(connections, 10)), host, port))
+        finally:
+            self._shutdown()
+
+    async def _run_socket_mode(self, connections: int, host: str, port: int):
+        from aiohttp import web
+        from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+
+        print(f"🤖 SlackBot (asyncio) is starting in Socket Mode with {connections} connection(s)")
+        runner = web.AppRunner(self.web_app(port))
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        print(f"❤️  Health check: http://{host}:{port}/health")
+
+        handlers = [AsyncSocketModeHandler(self.app, os.environ.get("SLACK_APP_TOKEN")) for _ in range(connections)]
+        try:
+            for handler in handlers:
+                await handler.connect_async()
+            await asyncio.Event().wait()
+        finally:
+            for handler in handlers:
+                await handler.close_async()
+            await runner.cleanup()
+
+
+def main():
+    """Main entry point"""
+    transport = os.environ.get("SLACK_TRANSPORT", "http").lower()
+    required_vars = ["SLACK_BOT_TOKEN", "SLACK_APP_TOKEN"] if transport == "socket" else ["SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET"]
+    missing_vars = [var for var in required_vars if not os.environ.get(var)]
+
+    if missing_vars:
+        print("❌ Missing required environment variables:")
+        for var in missing_vars:
+            print(f"   - {var}")
+        print("\nPlease check your .env file or environment variables.")
+        return
+
+    slack_bot = AsyncSlackChatBot()
+    port = int(os.environ.get("PORT", 3000))
+    host = os.environ.get("HOST", "0.0.0.0")
+
+    if transport == "socket":
+        slack_bot.run_socket_mode(connections=int(os.environ.get("SLACK_SOCKET_CONNECTIONS", 1)), host=host, port=port)
+    else:
+        slack_bot.run(host=host, port=port)
+
+
+if __name__ == "__main__":
+    main()
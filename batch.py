@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Batch Question Answering
+
+Answers many questions through ConfluenceBot in parallel, e.g. FAQ regression
+checks or cache pre-warming. Questions are read from a JSONL file or stdin and
+results are streamed to JSONL in completion order.
+
+Input lines are either JSON objects or plain questions:
+
+    {"id": "faq-1", "question": "How do I deploy to staging?"}
+    What is the on-call rotation?
+
+Usage:
+    python batch.py questions.jsonl -o answers.jsonl --workers 8
+    cat questions.txt | python batch.py > answers.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from chatbot import ConfluenceBot
+from page_store import PageStore
+from rate_limiter import background_priority
+
+
+def read_questions(lines: Iterable[str]) -> Iterator[Dict]:
+    """Parse JSONL or plain-text lines into {"id", "question"} items"""
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            item = None
+        if not isinstance(item, dict):
+            item = {'question': line}
+        item.setdefault('id', line_number)
+        yield item
+
+
+class BatchRunner:
+    """Answer questions with a pool of ConfluenceBot workers sharing one page cache"""
+
+    def __init__(self, workers: int = 4, use_llm: bool = True):
+        self.workers = workers
+        self.use_llm = use_llm
+        self.page_cache = PageStore(max_pages=int(os.environ.get("CONFLUENCE_CACHE_MAX_PAGES", 0)))
+        self._local = threading.local()
+
+    def _bot(self) -> ConfluenceBot:
+        """One bot per worker thread; conversation state is not shared, pages are"""
+        if not hasattr(self._local, 'bot'):
+            self._local.bot = ConfluenceBot("BatchBot", use_llm=self.use_llm, page_cache=self.page_cache)
+        return self._local.bot
+
+    def answer(self, item: Dict) -> Dict:
+        """Answer one question independently of the others"""
+        bot = self._bot()
+        bot.clear_history()
+        start = time.perf_counter()
+        result = {'id': item['id'], 'question': item.get('question', '')}
+        try:
+            with background_priority():
+                result['answer'] = bot.chat(result['question'])
+        except Exception as e:
+            result['error'] = str(e)
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def run(self, items: Iterable[Dict], output: TextIO) -> List[float]:
+        """Answer all items, writing each result as soon as it completes; returns latencies"""
+        latencies = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.answer, item) for item in items]
+            for future in as_completed(futures):
+                result = future.result()
+                latencies.append(result['latency_ms'])
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+        return latencies
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Batch entry point"""
+    parser = argparse.ArgumentParser(description="Answer questions from JSONL/stdin with ConfluenceBot")
+    parser.add_argument('input', nargs='?', default='-', help="JSONL or text file with one question per line (default: stdin)")
+    parser.add_argument('-o', '--output', default='-', help="JSONL file for results (default: stdout)")
+    parser.add_argument('-w', '--workers', type=int, default=int(os.environ.get("BATCH_WORKERS", 4)), help="parallel workers")
+    parser.add_argument('--no-llm', action='store_true', help="use pattern-based answers only")
+    args = parser.parse_args(argv)
+
+    use_llm = not args.no_llm and bool(os.environ.get("DEEPSEEK_API_KEY"))
+    runner = BatchRunner(workers=max(1, args.workers), use_llm=use_llm)
+
+    input_file = sys.stdin if args.input == '-' else open(args.input)
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        start = time.perf_counter()
+        latencies = runner.run(list(read_questions(input_file)), output_file)
+        elapsed = time.perf_counter() - start
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    throughput = len(latencies) / elapsed if elapsed else 0.0
+    print(
+        f"📊 {len(latencies)} questions in {elapsed:.1f}s with {runner.workers} workers: "
+        f"{throughput:.2f} questions/s, latency p50 {percentile(latencies, 0.5):.0f} ms, "
+        f"p95 {percentile(latencies, 0.95):.0f} ms, {len(runner.page_cache)} pages cached",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
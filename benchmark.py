@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+ConfluenceBot Benchmark Suite
+
+Measures the performance budgets documented in PERFORMANCE.md.
+
+Usage:
+    python benchmark.py              # run every benchmark
+    python benchmark.py startup      # run a single benchmark
+"""
+
+import argparse
+import os
+import random
+import re
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+# Startup-time budgets in milliseconds (see PERFORMANCE.md).
+# Each entry is measured with `python -X importtime` in a fresh interpreter.
+STARTUP_BUDGETS_MS = {
+    'cli': ('import chatbot; chatbot.ConfluenceBot()', 'chatbot', 100),
+    'slack': ('import slack_bot', 'slack_bot', 500),
+    'starter': ('import start_bot; start_bot.check_requirements()', 'start_bot', 50),
+}
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Parse `-X importtime` output into {top-level module: cumulative microseconds}"""
+    totals = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            totals[match.group(4)] = int(match.group(2))
+    return totals
+
+
+def bench_startup() -> bool:
+    """Measure import + construction time of each entry point against its budget"""
+    print("⏱️  Startup time (python -X importtime)")
+    all_ok = True
+
+    for name, (code, module, budget_ms) in STARTUP_BUDGETS_MS.items():
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        if result.returncode != 0:
+            print(f"   ❌ {name}: failed to import\n{result.stderr.strip().splitlines()[-1]}")
+            all_ok = False
+            continue
+
+        import_ms = parse_importtime(result.stderr).get(module, 0) / 1000
+        ok = import_ms <= budget_ms
+        all_ok &= ok
+        status = "✅" if ok else "❌"
+        print(f"   {status} {name:<8} import {import_ms:7.1f} ms (budget {budget_ms} ms), process wall {wall_ms:7.1f} ms")
+
+    return all_ok
+
+
+# Warm-restart budget: open a snapshot of this many pages and serve the first lookups
+SNAPSHOT_PAGES = 5000
+SNAPSHOT_BUDGET_MS = 20
+
+
+def sample_pages(count: int, content_size: int = 4000) -> List[Dict]:
+    """Build synthetic page data resembling extracted Confluence pages"""
+    words = "deployment service cluster token rollback monitoring release pipeline".split()
+    return [
+        {
+            'id': str(100000 + i),
+            'title': f"{words[i % len(words)].title()} Guide {i}",
+            'content': ' '.join(words[(i + j) % len(words)] for j in range(content_size // 9)),
+            'space_key': ('DEV', 'DOCS', 'WIKI')[i % 3],
+            'url': f"https://example.atlassian.net/wiki/spaces/DEV/pages/{100000 + i}"
+        }
+        for i in range(count)
+    ]
+
+
+def bench_snapshot() -> bool:
+    """Measure how quickly a fresh process can answer from a page snapshot"""
+    from page_snapshot import PageSnapshot, write_snapshot
+
+    print(f"💾 Page snapshot warm restart ({SNAPSHOT_PAGES} pages)")
+    pages = sample_pages(SNAPSHOT_PAGES)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'pages.snap')
+        start = time.perf_counter()
+        write_snapshot(path, ((f"id:{page['id']}", page) for page in pages))
+        write_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        snapshot = PageSnapshot(path)
+        for page in pages[:100]:
+            snapshot.get(f"{page['space_key']}:{page['title']}")
+        warm_ms = (time.perf_counter() - start) * 1000
+        size_mb = os.path.getsize(path) / 1e6
+        snapshot.close()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    ok = warm_ms <= SNAPSHOT_BUDGET_MS
+    status = "✅" if ok else "❌"
+    print(f"   write {write_ms:.1f} ms, file {size_mb:.1f} MB")
+    print(f"   {status} open + 100 lookups {warm_ms:.2f} ms (budget {SNAPSHOT_BUDGET_MS} ms)")
+    return ok
+
+
+# Peak memory budget for extracting one very large page in streaming mode
+EXTRACTION_PAGE_MB = 1
+EXTRACTION_BUDGET_MB = 2
+EXTRACTION_CAP_BYTES = 128_000
+
+
+def bench_extraction() -> bool:
+    """Compare peak memory of BeautifulSoup and streaming extraction on a huge table page"""
+    import tracemalloc
+    from chatbot import ConfluenceBot
+
+    print(f"📄 Large page extraction (~{EXTRACTION_PAGE_MB} MB storage body)")
+    row = "<tr><td>build-4711</td><td>deploy <b>ok</b></td><td>2024-01-01 12:00:00</td></tr>"
+    html_content = "<table>" + row * (EXTRACTION_PAGE_MB * 1_000_000 // len(row)) + "</table>"
+
+    bot = ConfluenceBot(use_llm=False)
+    bot.max_page_bytes = EXTRACTION_CAP_BYTES
+    results = {}
+    bot.streaming_extraction = False
+    for mode, extract in (
+        ('beautifulsoup', lambda: bot.extract_text_from_confluence_html(html_content)),
+        ('streaming', lambda: ''.join(bot.extract_text_chunks(html_content))),
+        # What fetches do with streaming off: over-cap bodies stream too
+        ('default', lambda: bot.extract_page_content({'body': {'storage': {'value': html_content}}})),
+    ):
+        tracemalloc.start()
+        start = time.perf_counter()
+        text = extract()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        results[mode] = peak_mb
+        print(f"   {mode:<14} peak {peak_mb:8.1f} MB, {elapsed_ms:8.1f} ms, {len(text) / 1e6:.1f} MB text")
+
+    ok = True
+    for mode in ('streaming', 'default'):
+        mode_ok = results[mode] <= EXTRACTION_BUDGET_MB
+        ok = ok and mode_ok
+        status = "✅" if mode_ok else "❌"
+        print(f"   {status} {mode} peak {results[mode]:.1f} MB (budget {EXTRACTION_BUDGET_MB} MB, cap {EXTRACTION_CAP_BYTES} bytes)")
+    return ok
+
+
+# Bytes per cached page: plain dicts vs PageStore records, for several users loading the same pages
+MEMORY_PAGES = 500
+MEMORY_USERS = 5
+MEMORY_BUDGET_RATIO = 0.25
+
+
+def realistic_pages(count: int, content_size: int = 6000) -> List[Dict]:
+    """Build pages with less repetitive text than sample_pages, so compression is not flattered"""
+    import random
+    rng = random.Random(42)
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 10))) for _ in range(3000)]
+    pages = sample_pages(count)
+    for page in pages:
+        page['content'] = ' '.join(rng.choice(vocabulary) for _ in range(content_size // 6))
+    return pages
+
+
+def bench_memory() -> bool:
+    """Measure bytes per cached page before (dicts) and after (PageStore)"""
+    import tracemalloc
+    from page_store import PageStore
+
+    print(f"🧮 Page cache memory ({MEMORY_PAGES} pages loaded by each of {MEMORY_USERS} users)")
+    results = {}
+    for mode in ('dict', 'page_store'):
+        pages = realistic_pages(MEMORY_PAGES)
+        tracemalloc.start()
+        caches = []
+        for _ in range(MEMORY_USERS):
+            cache = {} if mode == 'dict' else PageStore()
+            for page in pages:
+                # Pages arrive as fresh API responses for every user, cached by title and by id
+                page_data = {key: (value + ' ')[:-1] for key, value in page.items()}
+                cache[f"{page['space_key']}:{page['title']}"] = page_data
+                cache[f"id:{page['id']}"] = dict(page_data)
+            caches.append(cache)
+        del page_data
+        results[mode] = tracemalloc.get_traced_memory()[0] / (MEMORY_PAGES * MEMORY_USERS)
+        tracemalloc.stop()
+        del caches
+
+    ratio = results['page_store'] / results['dict']
+    ok = ratio <= MEMORY_BUDGET_RATIO
+    status = "✅" if ok else "❌"
+    print(f"   before (dict)       {results['dict']:10,.0f} bytes per cached page")
+    print(f"   after  (PageStore)  {results['page_store']:10,.0f} bytes per cached page")
+    print(f"   {status} ratio {ratio:.2f} (budget {MEMORY_BUDGET_RATIO})")
+    return ok
+
+
+# Per-message "already loaded" check must not grow with the number of cached pages
+INDEX_SIZES = (10, 5000)
+INDEX_BUDGET_RATIO = 3.0
+
+
+def bench_index() -> bool:
+    """Time per-message page lookups with a small and a large page cache"""
+    from page_store import PageStore
+
+    print("🔎 Page reference lookups (title, id, space:title, miss)")
+    timings = {}
+    for size in INDEX_SIZES:
+        store = PageStore()
+        for page in sample_pages(size, content_size=100):
+            store[f"{page['space_key']}:{page['title']}"] = page
+        references = ['rollback guide 4', '100003', 'DEV:Deployment Guide 0', 'No Such Page']
+        iterations = 20000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for reference in references:
+                store.find(reference)
+        timings[size] = (time.perf_counter() - start) / (iterations * len(references)) * 1e6
+        print(f"   {size:>6} pages: {timings[size]:.2f} µs per lookup")
+
+    ratio = timings[INDEX_SIZES[-1]] / timings[INDEX_SIZES[0]]
+    ok = ratio <= INDEX_BUDGET_RATIO
+    status = "✅" if ok else "❌"
+    print(f"   {status} large/small ratio {ratio:.2f} (budget {INDEX_BUDGET_RATIO})")
+    return ok
+
+
+# Title catalog: resolving exact, prefix and misspelled references among this many titles
+TITLE_CATALOG_SIZE = 10000
+TITLE_BUDGET_US = 1000
+
+
+def bench_titles() -> bool:
+    """Time local title resolution against the per-space remote lookups it replaces"""
+    from title_index import TitleCatalog
+
+    print(f"🔤 Title catalog lookups ({TITLE_CATALOG_SIZE} titles)")
+    rng = random.Random(7)
+    words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))) for _ in range(3000)]
+    catalog = TitleCatalog()
+    titles = []
+    for page_id in range(TITLE_CATALOG_SIZE):
+        title = ' '.join(rng.sample(words, rng.randint(2, 4))).title()
+        titles.append(title)
+        catalog.add(str(page_id), title, 'DEV')
+
+    title = titles[123]
+    references = {
+        'exact': title.lower(),
+        'prefix': title.split()[0] + ' ' + title.split()[1][:3],
+        'typo': title[:2] + title[3] + title[2] + title[4:],
+        'miss': 'Completely Unrelated Page',
+    }
+    ok = True
+    for kind, reference in references.items():
+        iterations = 200
+        start = time.perf_counter()
+        for _ in range(iterations):
+            match = catalog.resolve(reference)
+            if match is None:
+                suggestions = catalog.suggest(reference, limit=1)
+        elapsed_us = (time.perf_counter() - start) / iterations * 1e6
+        if kind == 'typo':
+            # Typos are never loaded automatically, only offered as "did you mean"
+            resolved = match is None and bool(suggestions) and suggestions[0].title == title
+        else:
+            resolved = (match is not None and match.title == title) if kind != 'miss' else match is None
+        ok &= resolved and elapsed_us <= TITLE_BUDGET_US
+        status = "✅" if resolved and elapsed_us <= TITLE_BUDGET_US else "❌"
+        print(f"   {status} {kind:<6} {elapsed_us:7.1f} µs (budget {TITLE_BUDGET_US} µs){'' if resolved else ' - wrong match'}")
+    return ok
+
+
+def bench_slack_latency() -> bool:
+    """Compare webhook and Socket Mode event-to-reply latency recorded in SLACK_LATENCY_LOG"""
+    import json
+
+    print("📡 Slack event-to-reply latency (http webhook vs Socket Mode)")
+    log_path = os.environ.get("SLACK_LATENCY_LOG")
+    if not log_path or not os.path.exists(log_path):
+        print("   ⏭️  skipped: set SLACK_LATENCY_LOG and run the Slack bot in each transport first")
+        return True
+
+    latencies = {}
+    with open(log_path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                latencies.setdefault(record['transport'], []).append(record['latency_ms'])
+
+    p50 = {}
+    for transport, values in sorted(latencies.items()):
+        values.sort()
+        p50[transport] = values[len(values) // 2]
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"   {transport:<7} p50 {p50[transport]:8.1f} ms, p95 {p95:8.1f} ms over {len(values)} replies")
+
+    if 'http' not in p50 or 'socket' not in p50:
+        print("   ⏭️  need samples from both transports to compare")
+        return True
+
+    ok = p50['socket'] <= p50['http']
+    status = "✅" if ok else "❌"
+    print(f"   {status} Socket Mode p50 {p50['socket'] - p50['http']:+.1f} ms relative to webhook")
+    return ok
+
+
+# Recorded Confluence webhooks: verification and time from delivery until no user serves the old copy
+WEBHOOK_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'examples', 'confluence_webhooks')
+WEBHOOK_DEBOUNCE_S = 0.05
+WEBHOOK_BUDGET_MS = 250
+
+
+def bench_webhooks() -> bool:
+    """Replay the recorded webhook fixtures through the Flask route and check eviction"""
+    import glob
+    import hashlib
+    import hmac
+    import json
+    from flask import Flask
+    from slack_bot import SlackChatBot
+
+    print("🔔 Confluence webhook invalidation (recorded fixtures)")
+    secret = "benchmark-secret"
+
+    # Only the webhook state and routes; the Slack app itself is never contacted
+    slack_bot = SlackChatBot.__new__(SlackChatBot)
+    slack_bot._init_state()
+    slack_bot.invalidator.secret = secret
+    slack_bot.invalidator.debounce_seconds = WEBHOOK_DEBOUNCE_S
+    slack_bot.flask_app = Flask(__name__)
+    slack_bot._setup_flask_routes()
+    client = slack_bot.flask_app.test_client()
+
+    ok = True
+    for path in sorted(glob.glob(os.path.join(WEBHOOK_FIXTURES, '*.json'))):
+        with open(path, 'rb') as f:
+            body = f.read()
+        page = json.loads(body)['page']
+        page_id = str(page['id'])
+
+        user_bot = slack_bot._get_user_bot("U-benchmark")
+        user_bot.confluence = None  # a refresh after invalidation must not reach a real Confluence
+        user_bot.page_snapshot = None
+        user_bot.confluence_content_cache[f"id:{page_id}"] = {
+            'id': page_id, 'title': page['title'], 'content': 'cached copy', 'space_key': page['spaceKey'], 'url': ''
+        }
+
+        signature = "sha256=" + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+        statuses = {
+            'unsigned': client.post("/confluence/webhook", data=body).status_code,
+            'bad signature': client.post("/confluence/webhook", data=body, headers={"X-Hub-Signature": "sha256=00"}).status_code,
+            'token': client.post(f"/confluence/webhook?token={secret}", data=body).status_code,
+        }
+        start = time.perf_counter()
+        statuses['signed'] = client.post("/confluence/webhook", data=body, headers={"X-Hub-Signature": signature}).status_code
+        while f"id:{page_id}" in user_bot.confluence_content_cache and time.perf_counter() - start < 2:
+            time.sleep(0.005)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        expected = {'unsigned': 401, 'bad signature': 401, 'token': 202, 'signed': 202}
+        evicted = f"id:{page_id}" not in user_bot.confluence_content_cache
+        fixture_ok = statuses == expected and evicted and elapsed_ms <= WEBHOOK_BUDGET_MS
+        ok = ok and fixture_ok
+        status = "✅" if fixture_ok else "❌"
+        print(f"   {status} {os.path.basename(path):<18} "
+              f"{' '.join(f'{name}={code}' for name, code in statuses.items())}, "
+              f"{'evicted' if evicted else 'NOT evicted'} after {elapsed_ms:.0f} ms (budget {WEBHOOK_BUDGET_MS} ms)")
+    return ok
+
+
+# Per-request cost of the profiling hook when a request is not sampled
+PROFILING_BUDGET_US = 10
+
+
+def bench_profiling() -> bool:
+    """Measure the overhead profiling hooks add to unsampled requests"""
+    import profiling
+
+    print("🔬 Profiling hook overhead (unsampled requests)")
+    if profiling.PROFILE_ALL or profiling.SAMPLE_RATE:
+        print("   ⏭️  skipped: unset CHAT_PROFILE and CHAT_PROFILE_SAMPLE_PERCENT to measure unsampled overhead")
+        return True
+
+    iterations = 100000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        message, requested = profiling.strip_debug_flag("what is our release process?")
+        with profiling.profile_request(force=requested):
+            pass
+    overhead_us = (time.perf_counter() - start) / iterations * 1e6
+
+    ok = overhead_us <= PROFILING_BUDGET_US
+    status = "✅" if ok else "❌"
+    print(f"   {status} {overhead_us:.2f} µs per request (budget {PROFILING_BUDGET_US} µs)")
+    return ok
+
+
+# Asyncio pipeline: concurrent conversations on one event loop with stubbed network latency
+ASYNC_CONVERSATIONS = 2000
+ASYNC_CONFLUENCE_LATENCY_S = 0.05
+ASYNC_LLM_LATENCY_S = 0.2
+ASYNC_BUDGET_S = 1.5
+
+
+def bench_async() -> bool:
+    """Run concurrent conversations about one uncached page through AsyncConfluenceBot"""
+    import asyncio
+    from types import SimpleNamespace
+    from async_chatbot import AsyncConfluenceBot
+
+    print(f"⚡ Asyncio pipeline ({ASYNC_CONVERSATIONS} conversations, "
+          f"{ASYNC_CONFLUENCE_LATENCY_S * 1000:.0f} ms Confluence / {ASYNC_LLM_LATENCY_S * 1000:.0f} ms LLM stubs)")
+    requests_made = []
+
+    class StubConfluence:
+        async def get_page_by_id(self, page_id, expand=None):
+            requests_made.append(page_id)
+            await asyncio.sleep(ASYNC_CONFLUENCE_LATENCY_S)
+            return {'id': page_id, 'title': 'Deployment Guide', 'space': {'key': 'DEV'}, 'version': {'number': 1},
+                    'body': {'storage': {'value': '<p>Roll back with the release tool.</p>'}}, '_links': {'webui': '/x'}}
+
+    async def create(**kwargs):
+        await asyncio.sleep(ASYNC_LLM_LATENCY_S)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Use the release tool."))],
+                               usage=None)
+
+    async def run() -> float:
+        deepseek = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        confluence = StubConfluence()
+        bots = [AsyncConfluenceBot("Bench", async_confluence=confluence, async_deepseek=deepseek)
+                for _ in range(ASYNC_CONVERSATIONS)]
+        for bot in bots:
+            bot.page_snapshot = None
+        start = time.perf_counter()
+        await asyncio.gather(*(bot.achat('What does page "4242" say about rollbacks?') for bot in bots))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    ok = elapsed <= ASYNC_BUDGET_S and len(requests_made) == 1
+    status = "✅" if ok else "❌"
+    print(f"   {status} {elapsed:.2f} s, {len(requests_made)} Confluence request(s) (budget {ASYNC_BUDGET_S} s, 1 request)")
+    return ok
+
+
+BENCHMARKS = {
+    'startup': bench_startup,
+    'snapshot': bench_snapshot,
+    'extraction': bench_extraction,
+    'memory': bench_memory,
+    'index': bench_index,
+    'titles': bench_titles,
+    'slack_latency': bench_slack_latency,
+    'webhooks': bench_webhooks,
+    'profiling': bench_profiling,
+    'async': bench_async,
+}
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the selected benchmarks; exit non-zero if any budget is exceeded"""
+    parser = argparse.ArgumentParser(description="ConfluenceBot benchmark suite")
+    parser.add_argument('benchmarks', nargs='*', help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    all_ok = True
+    for name in args.benchmarks or BENCHMARKS:
+        all_ok &= BENCHMARKS[name]()
+        print()
+
+    print("🎉 All budgets met" if all_ok else "❌ Some budgets were exceeded")
+    return 0 if all_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
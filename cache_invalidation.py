@@ -0,0 +1,98 @@
+"""
+Push-based invalidation of cached Confluence pages.
+
+Confluence webhooks (`page_updated`, `page_removed`, `page_moved`, ...) are
+verified, debounced and then handed to a callback that invalidates
+or refreshes only the affected cache entries. A burst of edits to one page
+(autosave, bulk moves) results in a single invalidation once the page has been
+quiet for the debounce window. A steady stream of events still flushes at
+least every `max_wait_seconds`.
+
+Payloads follow the Confluence webhook format:
+
+    {"event": "page_updated", "timestamp": 1700000000000,
+     "page": {"id": 123456, "spaceKey": "DEV", "title": "Deployment Guide"}}
+
+The event name may also be given in the `X-Event-Key` header.
+"""
+
+import hashlib
+import hmac
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+# Events that make a cached copy stale and whether the page still exists afterwards
+PAGE_EVENTS = {
+    'page_updated': True,
+    'page_restored': True,
+    'page_moved': True,
+    'page_removed': False,
+    'page_trashed': False,
+}
+
+
+class ConfluenceWebhookInvalidator:
+    """Verify and debounce Confluence page webhooks, then invalidate affected pages
+
+    `on_invalidate(page_id, page_exists)` is called from a background timer thread,
+    so refreshing a page never blocks the webhook response.
+    """
+
+    def __init__(self, on_invalidate: Callable[[str, bool], None], secret: Optional[str] = None,
+                 debounce_seconds: float = 2.0, max_wait_seconds: float = 10.0):
+        self.on_invalidate = on_invalidate
+        self.secret = secret
+        self.debounce_seconds = debounce_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: Dict[str, bool] = {}  # page id -> page still exists
+        self._timer: Optional[threading.Timer] = None
+        self._first_pending_at = 0.0
+        self._lock = threading.Lock()
+
+    def verify(self, body: bytes, signature: Optional[str] = None, token: Optional[str] = None) -> bool:
+        """Check an `X-Hub-Signature: sha256=<hex>` HMAC of the body, or a shared token"""
+        if not self.secret:
+            return False
+        if signature:
+            expected = "sha256=" + hmac.new(self.secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+            # Compare bytes: compare_digest rejects non-ASCII str, which would turn a forged header into a 500
+            return hmac.compare_digest(expected.encode('utf-8'), signature.encode('utf-8', 'surrogateescape'))
+        if token:
+            return hmac.compare_digest(self.secret.encode('utf-8'), token.encode('utf-8', 'surrogateescape'))
+        return False
+
+    def parse(self, payload: Dict, event: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """Return (event, page id) for page events we act on, otherwise None"""
+        event = payload.get('event') or event
+        page = payload.get('page') or {}
+        if event not in PAGE_EVENTS or not page.get('id'):
+            return None
+        return event, str(page['id'])
+
+    def submit(self, event: str, page_id: str):
+        """Queue a page for invalidation once it has been quiet for the debounce window"""
+        with self._lock:
+            self._pending[page_id] = PAGE_EVENTS[event]
+            now = time.monotonic()
+            if self._timer is None:
+                self._first_pending_at = now
+            elif now - self._first_pending_at >= self.max_wait_seconds:
+                return  # let the running timer flush the batch
+            else:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce_seconds, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Invalidate every pending page now"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._timer = None
+
+        for page_id, page_exists in pending.items():
+            try:
+                self.on_invalidate(page_id, page_exists)
+            except Exception as e:
+                print(f"Error invalidating Confluence page {page_id}: {e}")
@@ -2,50 +2,88 @@ import re
 import random
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from openai import OpenAI
+from typing import Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
-from atlassian import Confluence
-from bs4 import BeautifulSoup
-import requests
+from model_routing import SECTION_NOTES, RoutePolicy, model_router
+from page_digest import digest_store, select_passages
+from page_snapshot import PageSnapshot, open_snapshot, write_snapshot
+from page_store import PageStore
+from text_extraction import iter_text_chunks, truncate_utf8
+from title_index import TitleMatch, title_catalog
+import profiling
+
+# Heavy client libraries (openai, atlassian, bs4) and modules only needed behind
+# feature flags are imported lazily where they are first used so that CLI startup
+# and Slack worker cold starts stay fast.
 
 # Load environment variables
 load_dotenv()
 
+
+# Words that can appear in pure small talk ("thanks a lot!", "hi there bot") without adding a question
+SMALL_TALK_WORDS = {
+    'hi', 'hello', 'hey', 'greetings', 'good', 'morning', 'afternoon', 'evening',
+    'bye', 'goodbye', 'see', 'you', 'later', 'farewell', 'talk', 'to', 'ttyl',
+    'thanks', 'thank', 'thx', 'appreciated', 'so', 'much', 'a', 'lot', 'very',
+    'there', 'again', 'all', 'bot', 'ok', 'okay', 'great', 'cool', 'nice', 'awesome',
+    'for', 'the', 'help', 'that', 'was', 'helpful', 'perfect', 'cheers'
+}
+
 class ConfluenceBot:
-    def __init__(self, name: str = "ConfluenceBot", use_llm: bool = True):
+    def __init__(self, name: str = "ConfluenceBot", use_llm: bool = True, page_cache: Optional[PageStore] = None):
         self.name = name
         self.conversation_history = []
         self.user_name = None
         self.use_llm = use_llm
-        self.confluence_content_cache = {}
+        # Pass a shared PageStore to let several bots (e.g. batch workers) share one cache
+        if page_cache is None:
+            page_cache = PageStore(max_pages=int(os.environ.get("CONFLUENCE_CACHE_MAX_PAGES", 0)))
+        self.confluence_content_cache = page_cache
         
-        # Initialize DeepSeek client (OpenAI-compatible)
-        self.deepseek_client = None
-        if self.use_llm and os.environ.get("DEEPSEEK_API_KEY"):
-            try:
-                self.deepseek_client = OpenAI(
-                    api_key=os.environ.get("DEEPSEEK_API_KEY"),
-                    base_url="https://api.deepseek.com"
-                )
-            except Exception as e:
-                print(f"Warning: Could not initialize DeepSeek client: {e}")
-                self.deepseek_client = None
+        # DeepSeek (OpenAI-compatible) and Confluence clients are created on first use
+        self._deepseek_client = None
+        self._deepseek_configured = bool(self.use_llm and os.environ.get("DEEPSEEK_API_KEY"))
+        self._confluence = None
+        self._confluence_lock = threading.Lock()
+        self._confluence_configured = bool(os.environ.get("CONFLUENCE_URL") and os.environ.get("CONFLUENCE_USERNAME"))
         
-        # Initialize Confluence client
-        self.confluence = None
-        if os.environ.get("CONFLUENCE_URL") and os.environ.get("CONFLUENCE_USERNAME"):
-            try:
-                self.confluence = Confluence(
-                    url=os.environ.get("CONFLUENCE_URL"),
-                    username=os.environ.get("CONFLUENCE_USERNAME"),
-                    password=os.environ.get("CONFLUENCE_PASSWORD"),  # or API token
-                    api_version="cloud"  # or "server" for on-premise
-                )
-            except Exception as e:
-                print(f"Warning: Could not initialize Confluence client: {e}")
-                self.confluence = None
+        # Streaming extraction bounds peak memory per page fetch (see PERFORMANCE.md)
+        self.streaming_extraction = os.environ.get("CONFLUENCE_STREAMING_EXTRACTION", "false").lower() == "true"
+        self.max_page_bytes = int(os.environ.get("CONFLUENCE_MAX_PAGE_BYTES", 1_000_000))
+        
+        # Map-reduce answering over material longer than the context slices (see PERFORMANCE.md)
+        self.map_reduce_enabled = os.environ.get("MAP_REDUCE_ANSWERS", "false").lower() == "true"
+        # Smaller sections would mean one extraction call per handful of words
+        self.map_reduce_section_chars = max(500, int(os.environ.get("MAP_REDUCE_SECTION_CHARS", 6000)))
+        self.map_reduce_max_sections = int(os.environ.get("MAP_REDUCE_MAX_SECTIONS", 16))
+        self.map_reduce_max_workers = int(os.environ.get("MAP_REDUCE_MAX_WORKERS", 4))
+        
+        # Local fast path: confidently recognized small talk and commands skip the LLM
+        self.fast_path_threshold = float(os.environ.get("FAST_PATH_THRESHOLD", 0.8))
+        self.debug_mode = os.environ.get("DEBUG", "false").lower() == "true"
+        self.route_counts = {'small_talk': 0, 'command': 0, 'name': 0, 'llm': 0}
+        
+        # Memory-mapped snapshot of previously extracted pages (shared by all bots in the process)
+        self.snapshot_path = os.environ.get("CONFLUENCE_SNAPSHOT_PATH")
+        self._use_snapshot = True
+        
+        # Digests precomputed at ingest time replace raw page text in prompts (see PERFORMANCE.md)
+        self.page_digests = os.environ.get("PAGE_DIGESTS", "false").lower() == "true"
+        
+        # Local title catalog resolves loose/misspelled page references without per-space lookups
+        self.title_index_enabled = os.environ.get("CONFLUENCE_TITLE_INDEX", "false").lower() == "true"
+        self.title_match_threshold = float(os.environ.get("CONFLUENCE_TITLE_MATCH_THRESHOLD", 0.8))
+        
+        # Prefix-stable prompts: stable parts first so DeepSeek's context cache can reuse them (see PERFORMANCE.md)
+        self.prompt_cache_layout = os.environ.get("PROMPT_CACHE_LAYOUT", "false").lower() == "true"
+        self.max_pinned_pages = int(os.environ.get("PROMPT_PINNED_PAGES", 3))
+        self.pinned_pages: "OrderedDict[str, str]" = OrderedDict()
+        # Webhook invalidations unpin pages from another thread while a reply is being built
+        self._pins_lock = threading.Lock()
         
         # Enhanced system prompt for Confluence Q&A
         self.system_prompt = f"""You are {self.name}, an intelligent assistant that specializes in helping users with information from Confluence pages.
@@ -106,6 +144,76 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
             'load_page': [r'\b(load|get|fetch|read|show me|open)\s.*(page|document)\b'],
             'search_confluence': [r'\b(search|find|look for)\b.*\b(confluence|page|docs)\b']
         }
+        
+        # List the title catalog's spaces in the background now, so no chat request waits for it
+        if self.title_index_enabled and self._confluence_configured and self.confluence_spaces():
+            threading.Thread(target=self.title_catalog_ready, name="title-sync-start", daemon=True).start()
+
+    @property
+    def deepseek_client(self):
+        """DeepSeek client, constructed on first access"""
+        if self._deepseek_client is None and self._deepseek_configured:
+            try:
+                from openai import OpenAI
+                self._deepseek_client = OpenAI(
+                    api_key=os.environ.get("DEEPSEEK_API_KEY"),
+                    base_url="https://api.deepseek.com"
+                )
+            except Exception as e:
+                print(f"Warning: Could not initialize DeepSeek client: {e}")
+                self._deepseek_configured = False
+        return self._deepseek_client
+
+    @deepseek_client.setter
+    def deepseek_client(self, client):
+        self._deepseek_client = client
+        self._deepseek_configured = client is not None
+
+    @property
+    def confluence(self):
+        """Confluence client, constructed on first access"""
+        if self._confluence is None and self._confluence_configured:
+            # The title catalog's startup sync may construct it from another thread
+            with self._confluence_lock:
+                if self._confluence is None and self._confluence_configured:
+                    try:
+                        from atlassian import Confluence
+                        from rate_limiter import ADAPTIVE_LIMIT_ENABLED, limited_session
+                        self._confluence = Confluence(
+                            url=os.environ.get("CONFLUENCE_URL"),
+                            username=os.environ.get("CONFLUENCE_USERNAME"),
+                            password=os.environ.get("CONFLUENCE_PASSWORD"),  # or API token
+                            api_version="cloud",  # or "server" for on-premise
+                            # Shared AIMD limiter: backs off on 429/503 across every bot in the process
+                            session=limited_session() if ADAPTIVE_LIMIT_ENABLED else None
+                        )
+                    except Exception as e:
+                        print(f"Warning: Could not initialize Confluence client: {e}")
+                        self._confluence_configured = False
+        return self._confluence
+
+    @confluence.setter
+    def confluence(self, client):
+        self._confluence = client
+        self._confluence_configured = client is not None
+
+    @property
+    def page_snapshot(self) -> Optional[PageSnapshot]:
+        """The process-wide snapshot mapping, reopened after the file was replaced"""
+        return open_snapshot(self.snapshot_path) if self.snapshot_path and self._use_snapshot else None
+
+    @page_snapshot.setter
+    def page_snapshot(self, snapshot: Optional[PageSnapshot]):
+        # Assigning None turns snapshot lookups off for this bot (e.g. cold-cache replays)
+        self._use_snapshot = snapshot is not None
+
+    def deepseek_enabled(self) -> bool:
+        """Whether DeepSeek is configured, without constructing the client"""
+        return self.use_llm and (self._deepseek_client is not None or self._deepseek_configured)
+
+    def confluence_enabled(self) -> bool:
+        """Whether Confluence is configured, without constructing the client"""
+        return self._confluence is not None or self._confluence_configured
 
     def get_user_name(self, message: str) -> Optional[str]:
         """Extract user name from message if provided"""
@@ -122,32 +230,44 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
                 return match.group(1).capitalize()
         return None
 
+    def load_page_from_snapshot(self, cache_key: str) -> Optional[Dict]:
+        """Load a page from the warm snapshot into the cache, if present"""
+        snapshot = self.page_snapshot
+        if not snapshot:
+            return None
+        
+        page_data = snapshot.get(cache_key)
+        if page_data:
+            self._cache_page(cache_key, page_data)
+        return page_data
+
+    def _cache_page(self, cache_key: str, page_data: Dict):
+        """Cache a fetched page and schedule its digest in the background"""
+        self.confluence_content_cache[cache_key] = page_data
+        if self.title_index_enabled:
+            title_catalog.add(page_data['id'], page_data['title'], page_data['space_key'])
+        if self.page_digests:
+            record = self.confluence_content_cache.get(cache_key)
+            if record is not None:
+                digest_store.schedule(record, self.deepseek_client if self.deepseek_enabled() else None)
+
     def fetch_confluence_page_by_title(self, space_key: str, page_title: str) -> Optional[Dict]:
         """Fetch a Confluence page by space key and title"""
+        snapshot_page = self.load_page_from_snapshot(f"{space_key}:{page_title}")
+        if snapshot_page:
+            return snapshot_page
+        
         if not self.confluence:
             return None
         
         try:
-            page = self.confluence.get_page_by_title(space_key, page_title, expand='body.storage')
+            page = self.confluence.get_page_by_title(space_key, page_title, expand='body.storage,version')
             if page:
-                # Extract and clean the content
-                content = self.extract_text_from_confluence_html(page['body']['storage']['value'])
-                
-                # Safe URL construction
-                confluence_url = os.environ.get('CONFLUENCE_URL', '')
-                page_url = f"{confluence_url}{page['_links']['webui']}" if confluence_url else page['_links']['webui']
-                
-                page_data = {
-                    'id': page['id'],
-                    'title': page['title'],
-                    'content': content,
-                    'space_key': space_key,
-                    'url': page_url
-                }
+                page_data = self.page_data_from_api(page, self.extract_page_content(page), space_key)
                 
                 # Cache the content
                 cache_key = f"{space_key}:{page_title}"
-                self.confluence_content_cache[cache_key] = page_data
+                self._cache_page(cache_key, page_data)
                 
                 return page_data
         except Exception as e:
@@ -156,76 +276,110 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
 
     def fetch_confluence_page_by_id(self, page_id: str) -> Optional[Dict]:
         """Fetch a Confluence page by ID"""
+        snapshot_page = self.load_page_from_snapshot(f"id:{page_id}")
+        if snapshot_page:
+            return snapshot_page
+        
         if not self.confluence:
             return None
         
         try:
-            page = self.confluence.get_page_by_id(page_id, expand='body.storage,space')
+            page = self.confluence.get_page_by_id(page_id, expand='body.storage,space,version')
             if page:
-                content = self.extract_text_from_confluence_html(page['body']['storage']['value'])
-                
-                # Safe URL construction
-                confluence_url = os.environ.get('CONFLUENCE_URL', '')
-                page_url = f"{confluence_url}{page['_links']['webui']}" if confluence_url else page['_links']['webui']
-                
-                page_data = {
-                    'id': page['id'],
-                    'title': page['title'],
-                    'content': content,
-                    'space_key': page['space']['key'],
-                    'url': page_url
-                }
+                page_data = self.page_data_from_api(page, self.extract_page_content(page))
                 
                 # Cache the content
                 cache_key = f"id:{page_id}"
-                self.confluence_content_cache[cache_key] = page_data
+                self._cache_page(cache_key, page_data)
                 
                 return page_data
         except Exception as e:
             print(f"Error fetching Confluence page by ID: {e}")
             return None
 
+    def page_data_from_api(self, page: Dict, content: str, space_key: Optional[str] = None) -> Dict:
+        """Build the cached page dict from a Confluence REST page and its extracted text"""
+        # Safe URL construction
+        confluence_url = os.environ.get('CONFLUENCE_URL', '')
+        page_url = f"{confluence_url}{page['_links']['webui']}" if confluence_url else page['_links']['webui']
+        
+        return {
+            'id': page['id'],
+            'title': page['title'],
+            'content': content,
+            'space_key': space_key or page['space']['key'],
+            'url': page_url,
+            'version': page.get('version', {}).get('number', 0)
+        }
+
     def search_confluence_pages(self, query: str, space_key: str = None) -> List[Dict]:
         """Search for Confluence pages"""
         if not self.confluence:
             return []
         
         try:
-            # Build CQL query
-            cql = f'text ~ "{query}"'
-            if space_key:
-                cql += f' and space = "{space_key}"'
-            
-            results = self.confluence.cql(cql, limit=5)
-            pages = []
-            
-            # Safe URL construction
-            confluence_url = os.environ.get('CONFLUENCE_URL', '')
-            
-            for result in results.get('results', []):
-                if result.get('content', {}).get('type') == 'page':
-                    webui_link = result['content'].get('_links', {}).get('webui', '')
-                    page_url = f"{confluence_url}{webui_link}" if confluence_url else webui_link
-                    
-                    page_info = {
-                        'id': result['content']['id'],
-                        'title': result['content']['title'],
-                        'space_key': result['content']['space']['key'],
-                        'url': page_url
-                    }
-                    pages.append(page_info)
-            
-            return pages
+            results = self.confluence.cql(self.build_search_cql(query, space_key), limit=5)
+            return self.parse_search_results(results)
         except Exception as e:
             print(f"Error searching Confluence: {e}")
             return []
 
+    def build_search_cql(self, query: str, space_key: str = None) -> str:
+        """CQL for a full-text page search"""
+        cql = f'text ~ "{query}"'
+        if space_key:
+            cql += f' and space = "{space_key}"'
+        return cql
+
+    def parse_search_results(self, results: Dict) -> List[Dict]:
+        """Page summaries from a CQL search response"""
+        pages = []
+        
+        # Safe URL construction
+        confluence_url = os.environ.get('CONFLUENCE_URL', '')
+        
+        for result in results.get('results', []):
+            if result.get('content', {}).get('type') == 'page':
+                webui_link = result['content'].get('_links', {}).get('webui', '')
+                page_url = f"{confluence_url}{webui_link}" if confluence_url else webui_link
+                
+                page_info = {
+                    'id': result['content']['id'],
+                    'title': result['content']['title'],
+                    'space_key': result['content']['space']['key'],
+                    'url': page_url
+                }
+                pages.append(page_info)
+        
+        return pages
+
+    def extract_page_content(self, page: Dict) -> str:
+        """Extract text from a fetched page, releasing the raw body as early as possible
+        
+        The text is capped at max_page_bytes in both modes; bodies larger than the cap always
+        stream, so BeautifulSoup never builds a tree for a huge page.
+        """
+        html_content = page['body']['storage'].pop('value', '')
+        if not self.streaming_extraction and len(html_content) <= self.max_page_bytes:
+            return truncate_utf8(self.extract_text_from_confluence_html(html_content), self.max_page_bytes)
+        
+        return ''.join(self.extract_text_chunks(html_content))
+
+    def extract_text_chunks(self, html_content: str) -> Iterator[str]:
+        """Yield clean text from Confluence HTML incrementally, capped at max_page_bytes"""
+        try:
+            yield from iter_text_chunks(html_content, max_bytes=self.max_page_bytes)
+        except Exception as e:
+            print(f"Error extracting text from HTML: {e}")
+
     def extract_text_from_confluence_html(self, html_content: str) -> str:
         """Extract clean text from Confluence HTML content"""
         if not html_content:
             return ""
         
         try:
+            from bs4 import BeautifulSoup
+            
             # Parse with BeautifulSoup
             soup = BeautifulSoup(html_content, 'html.parser')
             
@@ -248,24 +402,70 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
 
     def get_confluence_context(self, message: str) -> str:
         """Get relevant Confluence content for the current message"""
-        context_parts = []
-        
         # Check if user is asking about a specific page
         page_mention = self.extract_page_reference(message)
-        if page_mention:
-            page_data = self.load_page_from_reference(page_mention)
-            if page_data:
-                context_parts.append(f"Page: {page_data['title']}")
+        page_data = self.load_page_from_reference(page_mention) if page_mention else None
+        return self.build_confluence_context(message, page_data)
+
+    def build_confluence_context(self, message: str, page_data: Optional[Dict]) -> str:
+        """Context from the page the message mentions (if loaded) and recently loaded pages"""
+        if self.prompt_cache_layout:
+            return self.build_turn_context(message, page_data)
+        
+        context_parts = []
+        if page_data:
+            context_parts.append(f"Page: {page_data['title']}")
+            digest = self.get_page_digest(page_data)
+            if digest:
+                # Dense digest first; raw text only for the passages the question is about
+                context_parts.append(f"Digest: {digest}")
+                for passage in select_passages(page_data['content'], message, page_data['title']):
+                    context_parts.append(f"Excerpt: ...{passage}...")
+            else:
                 context_parts.append(f"Content: {page_data['content'][:2000]}...")
         
         # Include recently loaded pages
-        for cache_key, page_data in list(self.confluence_content_cache.items())[-3:]:
+        for page_data in self.confluence_content_cache.recent(3):
             if len(context_parts) < 3:  # Limit context size
                 context_parts.append(f"Available Page: {page_data['title']}")
-                context_parts.append(f"Content snippet: {page_data['content'][:500]}...")
+                digest = self.get_page_digest(page_data)
+                if digest:
+                    context_parts.append(f"Digest: {digest[:500]}")
+                else:
+                    context_parts.append(f"Content snippet: {page_data['content'][:500]}...")
         
         return "\n\n".join(context_parts)
 
+    def build_turn_context(self, message: str, page_data: Optional[Dict]) -> str:
+        """Per-turn context for the prefix-stable layout: only the passages this question is about
+        
+        The page itself is pinned, so its digest or opening text sits in the stable prefix.
+        """
+        if not page_data:
+            return ""
+        self.pin_page(page_data)
+        pinned = self.pinned_pages.get(page_data['id'], '')
+        passages = [passage for passage in select_passages(page_data['content'], message, page_data['title'])
+                    if passage not in pinned]
+        return "\n\n".join([f"Page: {page_data['title']}"] + [f"Excerpt: ...{passage}..." for passage in passages])
+
+    def pin_page(self, page_data: Dict):
+        """Add a page to the stable prompt prefix; its text is frozen so the prefix stays byte-identical"""
+        if not self.prompt_cache_layout or page_data['id'] in self.pinned_pages:
+            return
+        summary = self.get_page_digest(page_data) or f"{page_data['content'][:2000]}..."
+        with self._pins_lock:
+            self.pinned_pages[page_data['id']] = f"Page: {page_data['title']}\n{summary}"
+            while len(self.pinned_pages) > self.max_pinned_pages:
+                self.pinned_pages.popitem(last=False)
+
+    def get_page_digest(self, page_data) -> Optional[str]:
+        """Precomputed digest of a cached page, if digests are enabled and it is ready"""
+        if not self.page_digests:
+            return None
+        record = self.confluence_content_cache.get(f"id:{page_data['id']}")
+        return digest_store.get(record) if record is not None else None
+
     def extract_page_reference(self, message: str) -> Optional[str]:
         """Extract page reference from user message"""
         # Look for patterns like "page titled X", "load page X", etc.
@@ -284,64 +484,164 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
 
     def load_page_from_reference(self, page_reference: str) -> Optional[Dict]:
         """Load a page from a reference (title or ID)"""
+        # Pages that are already cached resolve through the alias index without a remote call
+        cached_page = self.confluence_content_cache.find(page_reference)
+        if cached_page:
+            return cached_page
+        
         # Try as page ID first (if it's numeric)
         if page_reference.isdigit():
             return self.fetch_confluence_page_by_id(page_reference)
         
-        # Try to find by title in different spaces
-        common_spaces = os.environ.get("CONFLUENCE_SPACES", "").split(",")
+        # Resolve the title locally, then fetch by ID with a single request
+        if self.title_index_enabled and self.title_catalog_ready():
+            match = self.resolve_page_title(page_reference)
+            page_data = self.fetch_confluence_page_by_id(match.page_id) if match else None
+            if page_data:
+                return page_data
         
-        for space_key in common_spaces:
-            if space_key.strip():
-                page_data = self.fetch_confluence_page_by_title(space_key.strip(), page_reference)
-                if page_data:
-                    return page_data
+        # Try to find by title in different spaces
+        for space_key in self.confluence_spaces():
+            page_data = self.fetch_confluence_page_by_title(space_key, page_reference)
+            if page_data:
+                return page_data
         
         return None
 
-    def generate_deepseek_response(self, message: str) -> Optional[str]:
+    def confluence_spaces(self) -> List[str]:
+        """Space keys from CONFLUENCE_SPACES"""
+        return [space_key.strip() for space_key in os.environ.get("CONFLUENCE_SPACES", "").split(",") if space_key.strip()]
+
+    def title_catalog_ready(self) -> bool:
+        """Start listing unlisted or stale spaces in the background; False until every space was listed"""
+        spaces = self.confluence_spaces()
+        return bool(spaces and self.confluence and title_catalog.ensure_synced(self.confluence, spaces))
+
+    def resolve_page_title(self, page_reference: str) -> Optional[TitleMatch]:
+        """Catalog page an exact or unambiguous prefix reference names in the configured spaces"""
+        return title_catalog.resolve(page_reference, self.confluence_spaces(), self.title_match_threshold)
+
+    def suggest_page_titles(self, page_reference: str, limit: int = 3) -> List[TitleMatch]:
+        """Closest known titles for a reference that did not resolve"""
+        if not self.title_index_enabled:
+            return []
+        return title_catalog.suggest(page_reference, self.confluence_spaces() or None, limit=limit)
+
+    def get_relevant_pages(self, message: str) -> List[Dict]:
+        """Pages a question is about: the referenced page plus recently loaded pages"""
+        page_mention = self.extract_page_reference(message)
+        page_data = self.load_page_from_reference(page_mention) if page_mention else None
+        return self.collect_relevant_pages(page_data)
+
+    def collect_relevant_pages(self, page_data: Optional[Dict]) -> List[Dict]:
+        """The referenced page (if loaded) followed by recently loaded pages"""
+        pages = [page_data] if page_data else []
+        for page_data in self.confluence_content_cache.recent(3):
+            if all(page_data['id'] != page['id'] for page in pages):
+                pages.append(page_data)
+        return pages
+
+    def split_into_sections(self, pages: List[Dict]) -> List[Tuple[str, str]]:
+        """Split page contents into (page title, section text) pairs at word boundaries"""
+        sections = []
+        size = self.map_reduce_section_chars
+        for page_data in pages:
+            content = page_data['content']
+            start = 0
+            while start < len(content) and len(sections) < self.map_reduce_max_sections:
+                end = min(start + size, len(content))
+                if end < len(content):
+                    boundary = content.rfind(' ', start + size // 2, end)
+                    end = boundary if boundary != -1 else end
+                section = content[start:end].strip()
+                if section:
+                    sections.append((page_data['title'], section))
+                start = end
+        return sections
+
+    def needs_map_reduce(self, message: str, pages: List[Dict]) -> bool:
+        """Whether a question is about material longer than get_confluence_context would include
+
+        Only questions that name a page or mention terms found in the loaded pages fan
+        out; anything else (small talk, general questions) keeps the single-call path.
+        """
+        if not self.map_reduce_enabled or sum(len(page_data['content']) for page_data in pages) <= 2000:
+            return False
+        if self.extract_page_reference(message):
+            return True
+        return any(select_passages(page_data['content'], message, page_data['title']) for page_data in pages)
+
+    def extract_section_notes(self, message: str, title: str, section: str) -> Optional[str]:
+        """Map step: pull out what one section says about the question"""
+        try:
+            start, response = time.perf_counter(), None
+            try:
+                response = self.deepseek_client.chat.completions.create(**self.section_notes_request(message, title, section))
+            finally:
+                model_router.record(SECTION_NOTES, time.perf_counter() - start, getattr(response, 'usage', None),
+                                    error=response is None)
+            notes = response.choices[0].message.content.strip()
+            return None if notes.upper().startswith("NONE") else notes
+        except Exception as e:
+            print(f"Error extracting section notes: {e}")
+            return None
+
+    def section_notes_request(self, message: str, title: str, section: str) -> Dict:
+        """Chat completion arguments for the map step over one section"""
+        section_text = f"Section of Confluence page '{title}':\n{section}"
+        # Section first in the prefix-stable layout: the same section is cached across questions
+        if self.prompt_cache_layout:
+            content = f"{section_text}\n\nQuestion: {message}"
+        else:
+            content = f"Question: {message}\n\n{section_text}"
+        return {
+            **model_router.request_options(SECTION_NOTES),
+            'messages': [
+                {"role": "system", "content": "You extract facts from documentation. Quote names, numbers and steps exactly. If the section contains nothing relevant to the question, reply with NONE."},
+                {"role": "user", "content": content}
+            ],
+            'stream': False
+        }
+
+    def map_reduce_context(self, sections: List[Tuple[str, str]], notes: List[Optional[str]], pages: List[Dict]) -> str:
+        """Combine per-section notes into the context for the reduce step"""
+        context_parts = [f"Notes from page: {title}\n{note}" for (title, _), note in zip(sections, notes) if note]
+        if not context_parts:
+            context_parts = [f"Available Page: {page_data['title']}" for page_data in pages]
+        return "\n\n".join(context_parts)
+
+    def generate_map_reduce_response(self, message: str, pages: List[Dict]) -> Optional[str]:
+        """Answer over long or multiple pages: extract notes per section concurrently, then reduce"""
+        if not self.deepseek_client:
+            return None
+        
+        from concurrent.futures import ThreadPoolExecutor
+
+        sections = self.split_into_sections(pages)
+        with ThreadPoolExecutor(max_workers=max(1, self.map_reduce_max_workers)) as executor:
+            notes = list(executor.map(lambda section: self.extract_section_notes(message, *section), sections))
+        
+        # Reduce step: one final answer from the collected notes
+        return self.generate_deepseek_response(message, confluence_context=self.map_reduce_context(sections, notes, pages))
+
+    def generate_deepseek_response(self, message: str, confluence_context: Optional[str] = None) -> Optional[str]:
         """Generate response using DeepSeek LLM"""
         if not self.deepseek_client:
             return None
         
         try:
             # Get Confluence context
-            confluence_context = self.get_confluence_context(message)
-            
-            # Build conversation history
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add Confluence context if available
-            if confluence_context:
-                messages.append({
-                    "role": "system", 
-                    "content": f"Relevant Confluence Content:\n{confluence_context}"
-                })
-            
-            # Add conversation history
-            for conv in self.get_conversation_context():
-                messages.append({"role": "user", "content": conv['user']})
-                if conv['bot']:
-                    messages.append({"role": "assistant", "content": conv['bot']})
+            if confluence_context is None:
+                confluence_context = self.get_confluence_context(message)
             
-            # Add current message
-            messages.append({"role": "user", "content": message})
-            
-            # Add user name context if known
-            if self.user_name:
-                messages.insert(-1, {
-                    "role": "system", 
-                    "content": f"The user's name is {self.user_name}. Use their name naturally when appropriate."
-                })
-            
-            # Call DeepSeek API
-            response = self.deepseek_client.chat.completions.create(
-                model="deepseek-chat",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7,
-                stream=False
-            )
+            # Call DeepSeek API with the model and budget of the question's route
+            policy, request = self.answer_request(message, confluence_context)
+            start, response = time.perf_counter(), None
+            try:
+                response = self.deepseek_client.chat.completions.create(**request)
+            finally:
+                model_router.record(policy, time.perf_counter() - start, getattr(response, 'usage', None),
+                                    error=response is None)
             
             return response.choices[0].message.content.strip()
             
@@ -349,10 +649,92 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
             print(f"Error generating DeepSeek response: {e}")
             return None
 
+    def answer_request(self, message: str, confluence_context: Optional[str]) -> Tuple[RoutePolicy, Dict]:
+        """Route a question and build its chat completion arguments"""
+        policy = model_router.choose(message, confluence_context)
+        return policy, {
+            **model_router.request_options(policy),
+            'messages': self.build_llm_messages(message, confluence_context),
+            'stream': False
+        }
+
+    def build_llm_messages(self, message: str, confluence_context: Optional[str]) -> List[Dict]:
+        """System prompt, Confluence context, recent history and the current message"""
+        if self.prompt_cache_layout:
+            return self.build_prefix_stable_messages(message, confluence_context)
+        
+        # Build conversation history
+        messages = [{"role": "system", "content": self.system_prompt}]
+        
+        # Add Confluence context if available
+        if confluence_context:
+            messages.append({
+                "role": "system", 
+                "content": f"Relevant Confluence Content:\n{confluence_context}"
+            })
+        
+        # Add conversation history
+        for conv in self.get_conversation_context():
+            messages.append({"role": "user", "content": conv['user']})
+            if conv['bot']:
+                messages.append({"role": "assistant", "content": conv['bot']})
+        
+        # Add current message
+        messages.append({"role": "user", "content": message})
+        
+        # Add user name context if known
+        if self.user_name:
+            messages.insert(-1, {
+                "role": "system", 
+                "content": f"The user's name is {self.user_name}. Use their name naturally when appropriate."
+            })
+        return messages
+
+    def build_prefix_stable_messages(self, message: str, confluence_context: Optional[str]) -> List[Dict]:
+        """Messages ordered from most to least stable, so consecutive calls share a long prefix
+        
+        System prompt, persona, pinned pages and completed turns are byte-identical from one
+        call to the next (history only grows at the end); the per-turn context and the
+        current message come last.
+        """
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if self.user_name:
+            messages.append({
+                "role": "system",
+                "content": f"The user's name is {self.user_name}. Use their name naturally when appropriate."
+            })
+        with self._pins_lock:
+            pinned = list(self.pinned_pages.values())
+        if pinned:
+            messages.append({
+                "role": "system",
+                "content": "Pinned Confluence Pages:\n\n" + "\n\n".join(pinned)
+            })
+        
+        for conv in self.get_stable_conversation_context():
+            messages.append({"role": "user", "content": conv['user']})
+            messages.append({"role": "assistant", "content": conv['bot']})
+        
+        if confluence_context:
+            messages.append({"role": "system", "content": f"Relevant Confluence Content:\n{confluence_context}"})
+        messages.append({"role": "user", "content": message})
+        return messages
+
     def get_conversation_context(self, limit: int = 10) -> List[Dict]:
         """Get recent conversation history for LLM context"""
         return self.conversation_history[-limit:] if self.conversation_history else []
 
+    def get_stable_conversation_context(self, limit: int = 10) -> List[Dict]:
+        """Completed turns, trimmed in blocks of limit/2 rather than one turn at a time
+        
+        A sliding window changes the first history message on every turn; dropping old turns
+        in blocks keeps the prefix stable for limit/2 turns at a time.
+        """
+        turns = [conv for conv in self.conversation_history if conv['bot'] is not None]
+        step = max(1, limit // 2)
+        start = max(0, len(turns) - limit)
+        return turns[start - start % step:]
+
     def recognize_intent(self, message: str) -> str:
         """Recognize the intent behind a user message"""
         message_lower = message.lower()
@@ -364,35 +746,86 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
         
         return 'default'
 
+    def route_message(self, message: str) -> Tuple[str, float]:
+        """Score how confidently a message can be answered locally
+        
+        Returns (route, confidence) where route is 'small_talk', 'command', 'name' or 'llm'.
+        """
+        message_lower = message.lower().strip()
+        words = re.findall(r"[a-z']+", message_lower)
+        if not words:
+            return 'llm', 0.0
+        
+        # Follow-up asks ("... and summarize it", "why ...?") need the LLM even after a command
+        follow_up = bool(re.search(r"\?|\b(and|then|explain|summari[sz]e|why|how|what)\b", message_lower))
+        
+        if re.match(r'^(?:please\s+)?(?:load|read)\s+page\b', message_lower) or \
+                re.match(r'^(?:please\s+)?search\s+(?:for\s+)?(?:confluence|pages?)\b', message_lower):
+            return 'command', 0.5 if follow_up else 0.95
+        
+        if re.search(r"\b(my name is|call me)\s+\w+", message_lower) and len(words) <= 5:
+            return 'name', 0.5 if follow_up else 0.9
+        
+        if self.recognize_intent(message) in ('greeting', 'goodbye', 'thanks'):
+            confidence = sum(word in SMALL_TALK_WORDS for word in words) / len(words)
+            return 'small_talk', confidence * 0.5 if follow_up else confidence
+        
+        return 'llm', 0.0
+
+    def fast_path_route(self, message: str) -> Optional[str]:
+        """The local route for a message if it is confident enough to skip the LLM"""
+        route, confidence = self.route_message(message)
+        use_fast_path = route != 'llm' and confidence >= self.fast_path_threshold
+        if self.debug_mode:
+            print(f"🧭 route={route} confidence={confidence:.2f} fast_path={use_fast_path}")
+        return route if use_fast_path else None
+
     def handle_confluence_command(self, message: str) -> Optional[str]:
         """Handle specific Confluence commands"""
+        command = self.parse_confluence_command(message)
+        if not command:
+            return None
+        
+        action, argument = command
+        if action == 'load':
+            return self.format_load_result(argument, self.load_page_from_reference(argument))
+        return self.format_search_results(argument, self.search_confluence_pages(argument))
+
+    def parse_confluence_command(self, message: str) -> Optional[Tuple[str, str]]:
+        """Recognize ('load', page reference) and ('search', query) commands"""
         message_lower = message.lower()
         
         # Load page command
         if "load page" in message_lower or "read page" in message_lower:
             page_ref = self.extract_page_reference(message)
             if page_ref:
-                page_data = self.load_page_from_reference(page_ref)
-                if page_data:
-                    return f"✅ Successfully loaded page: **{page_data['title']}**\n\nYou can now ask me questions about this page content!"
-                else:
-                    return f"❌ Could not find page: '{page_ref}'. Please check the title and try again."
+                return 'load', page_ref
         
         # Search command
         if "search" in message_lower and ("confluence" in message_lower or "pages" in message_lower):
             # Extract search query
             search_match = re.search(r'search\s+(?:for\s+)?(?:confluence\s+)?(?:pages?\s+)?(?:about\s+)?(.+)', message_lower)
             if search_match:
-                query = search_match.group(1).strip()
-                results = self.search_confluence_pages(query)
-                if results:
-                    result_list = "\n".join([f"• {r['title']} (ID: {r['id']})" for r in results[:5]])
-                    return f"🔍 Found {len(results)} pages for '{query}':\n\n{result_list}\n\nWould you like me to load any of these pages?"
-                else:
-                    return f"🔍 No pages found for '{query}'. Try different keywords."
+                return 'search', search_match.group(1).strip()
         
         return None
 
+    def format_load_result(self, page_ref: str, page_data: Optional[Dict]) -> str:
+        if page_data:
+            self.pin_page(page_data)
+            return f"✅ Successfully loaded page: **{page_data['title']}**\n\nYou can now ask me questions about this page content!"
+        suggestions = self.suggest_page_titles(page_ref)
+        if suggestions:
+            suggestion_list = "\n".join([f"• {s.title} ({s.space_key})" for s in suggestions])
+            return f"❌ Could not find page: '{page_ref}'. Did you mean:\n\n{suggestion_list}"
+        return f"❌ Could not find page: '{page_ref}'. Please check the title and try again."
+
+    def format_search_results(self, query: str, results: List[Dict]) -> str:
+        if results:
+            result_list = "\n".join([f"• {r['title']} (ID: {r['id']})" for r in results[:5]])
+            return f"🔍 Found {len(results)} pages for '{query}':\n\n{result_list}\n\nWould you like me to load any of these pages?"
+        return f"🔍 No pages found for '{query}'. Try different keywords."
+
     def generate_fallback_response(self, message: str) -> str:
         """Generate fallback response using pattern matching"""
         # Check if user is providing their name
@@ -406,6 +839,10 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
         if confluence_response:
             return confluence_response
         
+        return self.generate_pattern_response(message)
+
+    def generate_pattern_response(self, message: str) -> str:
+        """Canned response for the recognized intent"""
         # Recognize intent and generate response
         intent = self.recognize_intent(message)
         
@@ -426,9 +863,18 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
         if potential_name:
             self.user_name = potential_name
         
+        # Answer trivial turns locally without a network call when we are confident
+        route = self.fast_path_route(message)
+        if route:
+            response = self.handle_confluence_command(message) if route == 'command' else self.generate_fallback_response(message)
+            if response:
+                self.route_counts[route] += 1
+                return response
+        self.route_counts['llm'] += 1
+        
         # Handle page loading automatically if page reference is detected
         page_ref = self.extract_page_reference(message)
-        if page_ref and page_ref not in [p.get('title', '') for p in self.confluence_content_cache.values()]:
+        if page_ref and not self.confluence_content_cache.find(page_ref):
             page_data = self.load_page_from_reference(page_ref)
             if page_data:
                 # Let the LLM know we loaded the page
@@ -436,7 +882,11 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
         
         # Try DeepSeek first if available
         if self.use_llm and self.deepseek_client:
-            llm_response = self.generate_deepseek_response(message)
+            relevant_pages = self.get_relevant_pages(message) if self.map_reduce_enabled else []
+            if self.needs_map_reduce(message, relevant_pages):
+                llm_response = self.generate_map_reduce_response(message, relevant_pages)
+            else:
+                llm_response = self.generate_deepseek_response(message)
             if llm_response:
                 return llm_response
         
@@ -445,46 +895,93 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
 
     def chat(self, message: str) -> str:
         """Main chat method that processes a message and returns a response"""
+        message, profile_requested = profiling.strip_debug_flag(message)
         if not message.strip():
             return "I didn't catch that. Could you say something? You can ask me about Confluence pages!"
         
-        # Store the conversation
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.conversation_history.append({
-            'timestamp': timestamp,
-            'user': message,
-            'bot': None
-        })
+        # Opt-in profiling (CHAT_PROFILE, CHAT_PROFILE_SAMPLE_PERCENT or a !profile message)
+        with profiling.profile_request(force=profile_requested):
+            return self._chat(message)
+
+    def _chat(self, message: str) -> str:
+        """Store the turn, generate a response and record it in the history"""
+        turn = self.start_turn(message)
         
         # Generate response
         response = self.generate_response(message)
         
         # Update conversation history with bot response
-        self.conversation_history[-1]['bot'] = response
+        turn['bot'] = response
         
         return response
 
+    def start_turn(self, message: str) -> Dict:
+        """Append a new turn to the conversation history"""
+        # Store the conversation
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        turn = {
+            'timestamp': timestamp,
+            'user': message,
+            'bot': None
+        }
+        self.conversation_history.append(turn)
+        return turn
+
     def get_conversation_history(self) -> List[Dict]:
         """Return the conversation history"""
         return self.conversation_history
 
     def get_loaded_pages(self) -> List[str]:
         """Get list of currently loaded page titles"""
-        return [page_data['title'] for page_data in self.confluence_content_cache.values()]
+        return self.confluence_content_cache.titles()
 
     def clear_confluence_cache(self):
         """Clear the Confluence content cache"""
-        self.confluence_content_cache = {}
+        self.confluence_content_cache.clear()
+        with self._pins_lock:
+            self.pinned_pages.clear()
+
+    def invalidate_page(self, page_id: str, refresh: bool = False) -> bool:
+        """Drop a page from the cache and snapshot lookups, optionally re-fetching it
+        
+        Returns True if the page was cached.
+        """
+        snapshot = self.page_snapshot
+        if snapshot:
+            snapshot.mark_stale(page_id)
+        with self._pins_lock:
+            self.pinned_pages.pop(str(page_id), None)
+        
+        record = self.confluence_content_cache.evict(str(page_id))
+        if record and refresh:
+            self.fetch_confluence_page_by_id(str(page_id))
+        return record is not None
+
+    def save_snapshot(self, path: Optional[str] = None) -> Optional[str]:
+        """Write cached pages (merged with the current snapshot) to a snapshot file"""
+        path = path or self.snapshot_path
+        if not path:
+            return None
+        
+        pages = list(self.confluence_content_cache.items())
+        snapshot = self.page_snapshot
+        if snapshot:
+            pages.extend(snapshot.items())
+        
+        write_snapshot(path, pages)
+        return path
 
     def get_status(self) -> Dict:
         """Get bot status information"""
         return {
             'name': self.name,
-            'deepseek_enabled': self.use_llm and self.deepseek_client is not None,
-            'confluence_enabled': self.confluence is not None,
+            'deepseek_enabled': self.deepseek_enabled(),
+            'confluence_enabled': self.confluence_enabled(),
             'conversations': len(self.conversation_history),
             'loaded_pages': len(self.confluence_content_cache),
-            'user_name': self.user_name
+            'snapshot_entries': len(self.page_snapshot or ()),
+            'user_name': self.user_name,
+            'routes': dict(self.route_counts)
         }
 
     def save_conversation(self, filename: Optional[str] = None):
@@ -499,8 +996,8 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
                 'user_name': self.user_name,
                 'conversation': self.conversation_history,
                 'loaded_pages': list(self.confluence_content_cache.keys()),
-                'deepseek_enabled': self.use_llm and self.deepseek_client is not None,
-                'confluence_enabled': self.confluence is not None
+                'deepseek_enabled': self.deepseek_enabled(),
+                'confluence_enabled': self.confluence_enabled()
             }, f, indent=2)
         
         return filename
@@ -509,6 +1006,8 @@ Be conversational, helpful, and accurate. Remember user names and maintain conte
         """Clear the conversation history"""
         self.conversation_history = []
         self.user_name = None
+        with self._pins_lock:
+            self.pinned_pages.clear()
 
 # Backwards compatibility
 ChatBot = ConfluenceBot
@@ -553,6 +1052,9 @@ def main():
                         filename = bot.save_conversation()
                         print(f"Conversation saved to {filename}")
                 
+                if bot.snapshot_path and bot.confluence_content_cache:
+                    print(f"Page snapshot saved to {bot.save_snapshot()}")
+                
                 break
             
             if user_input:
@@ -0,0 +1,191 @@
+"""
+Cost/latency-aware routing of DeepSeek answer calls.
+
+Every answer call is assigned a route from a policy table. Each route sets the
+model, `max_tokens`, `temperature` and timeout. The route is picked from a
+complexity score for the question and the size of the retrieved context:
+
+    score = length (0-2) + reasoning cues (0-2) + extra questions (0-1) + context size (0-2)
+
+Routes are tried in order of `max_score`, and the first one whose `max_score`
+is at least the score wins. The default table:
+
+    lookup    score 0       short factual answers   deepseek-chat  250 tokens   15 s
+    standard  score 1-2     the previous fixed call deepseek-chat  500 tokens   30 s
+    complex   score 3+      long/multi-part answers deepseek-chat  1200 tokens  60 s
+
+`MODEL_ROUTING_POLICY` points to a JSON file that overrides or adds routes, e.g.
+
+    {"complex": {"model": "deepseek-reasoner", "max_tokens": 2000, "timeout": 90}}
+
+Each call's latency and token usage (including DeepSeek's `prompt_cache_hit_tokens`)
+are recorded per route (`model_router.summary()`,
+and one JSONL line per call in `MODEL_ROUTING_LOG`), so the table can be tuned
+from real traffic. With `MODEL_ROUTING=false` every call uses the `standard` route.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+class RoutePolicy(NamedTuple):
+    name: str
+    model: str
+    max_tokens: int
+    temperature: float
+    timeout: float
+    max_score: float
+
+
+DEFAULT_POLICIES = {
+    'lookup': RoutePolicy('lookup', "deepseek-chat", 250, 0.3, 15.0, 0),
+    'standard': RoutePolicy('standard', "deepseek-chat", 500, 0.7, 30.0, 2),
+    'complex': RoutePolicy('complex', "deepseek-chat", 1200, 0.7, 60.0, math.inf),
+}
+
+# Map-step extraction calls in map-reduce answering are not routed, but are recorded under this name
+SECTION_NOTES = RoutePolicy('section_notes', "deepseek-chat", 300, 0, 30.0, math.inf)
+
+# Background page digest calls (see page_digest) are recorded under this name
+PAGE_DIGEST = RoutePolicy('page_digest', "deepseek-chat", 600, 0, 60.0, math.inf)
+
+# Words that signal an answer needs reasoning or several steps rather than a single fact
+REASONING_CUES = re.compile(
+    r"\b(why|how|explain|compare|comparison|difference|differences|versus|vs|trade-?offs?|pros|cons|"
+    r"design|architecture|troubleshoot|debug|step[- ]by[- ]step|steps|summari[sz]e|overview|all|every|plan)\b"
+)
+
+
+def estimate_complexity(message: str, context_chars: int = 0) -> int:
+    """Score how much answer budget a question needs (0 = simple lookup)"""
+    message_lower = message.lower()
+    words = len(re.findall(r"[\w'-]+", message_lower))
+    score = 2 if words > 40 else 1 if words > 15 else 0
+    score += min(2, len(REASONING_CUES.findall(message_lower)))
+    score += 1 if message.count('?') > 1 else 0
+    score += 2 if context_chars > 6000 else 1 if context_chars > 2000 else 0
+    return score
+
+
+def load_policies(path: Optional[str] = None) -> Dict[str, RoutePolicy]:
+    """Default routes updated with the routes in a JSON policy file"""
+    policies = dict(DEFAULT_POLICIES)
+    if not path:
+        return policies
+    try:
+        with open(path) as f:
+            overrides = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Could not read model routing policy {path}: {e}")
+        return policies
+    if not isinstance(overrides, dict):
+        print(f"⚠️  Model routing policy {path} must be a JSON object of routes, using the defaults")
+        return policies
+
+    for name, fields in overrides.items():
+        if not isinstance(fields, dict):
+            print(f"⚠️  Skipping model routing route {name!r} in {path}: expected an object of fields")
+            continue
+        base = policies.get(name, DEFAULT_POLICIES['standard'])._replace(name=name)
+        fields = {key: value for key, value in fields.items() if key in RoutePolicy._fields and key != 'name'}
+        if 'max_score' in fields and fields['max_score'] is None:  # null = no upper bound
+            fields['max_score'] = math.inf
+        policies[name] = base._replace(**fields)
+    return policies
+
+
+class ModelRouter:
+    """Picks a route per answer call and keeps per-route latency and token statistics"""
+
+    def __init__(self, policies: Optional[Dict[str, RoutePolicy]] = None, enabled: bool = True,
+                 log_path: Optional[str] = None, window: int = 1000):
+        self.policies = policies or dict(DEFAULT_POLICIES)
+        self.enabled = enabled
+        self.log_path = log_path
+        self._routes = sorted(self.policies.values(), key=lambda policy: policy.max_score)
+        self._latencies: Dict[str, deque] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def choose(self, message: str, context: Optional[str] = None) -> RoutePolicy:
+        """The route for a question given the context that will be sent with it"""
+        if not self.enabled:
+            return self.policies['standard']
+        score = estimate_complexity(message, len(context or ''))
+        return next((policy for policy in self._routes if score <= policy.max_score), self._routes[-1])
+
+    def request_options(self, policy: RoutePolicy) -> Dict[str, Any]:
+        """Chat completion arguments for a route (everything except the messages)"""
+        return {
+            'model': policy.model,
+            'max_tokens': policy.max_tokens,
+            'temperature': policy.temperature,
+            'timeout': policy.timeout,
+        }
+
+    def record(self, policy: RoutePolicy, latency: float, usage: Any = None, error: bool = False):
+        """Record one call's latency (seconds) and token usage for its route"""
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        # DeepSeek reports how much of the prompt was served from its context cache
+        cache_hit_tokens = getattr(usage, 'prompt_cache_hit_tokens', 0) or 0
+        with self._lock:
+            self._latencies.setdefault(policy.name, deque(maxlen=self._window)).append(latency * 1000)
+            totals = self._totals.setdefault(policy.name, {
+                'calls': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cache_hit_tokens': 0,
+                'truncated': 0
+            })
+            totals['calls'] += 1
+            totals['errors'] += int(error)
+            totals['prompt_tokens'] += prompt_tokens
+            totals['completion_tokens'] += completion_tokens
+            totals['cache_hit_tokens'] += cache_hit_tokens
+            # Answers that used the whole budget were probably cut off: the route may need more tokens
+            totals['truncated'] += int(completion_tokens >= policy.max_tokens)
+
+        if self.log_path:
+            entry = {
+                'route': policy.name, 'model': policy.model, 'latency_ms': round(latency * 1000, 1),
+                'prompt_tokens': prompt_tokens, 'prompt_cache_hit_tokens': cache_hit_tokens,
+                'completion_tokens': completion_tokens, 'error': error
+            }
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-route call counts, p50/p95 latency, mean token usage and prompt cache hit rate"""
+        summary = {}
+        with self._lock:
+            for name, totals in self._totals.items():
+                ordered: List[float] = sorted(self._latencies[name])
+                calls = totals['calls']
+                summary[name] = {
+                    'calls': calls,
+                    'errors': totals['errors'],
+                    'truncated': totals['truncated'],
+                    'p50_ms': round(ordered[len(ordered) // 2], 1),
+                    'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+                    'avg_prompt_tokens': round(totals['prompt_tokens'] / calls, 1),
+                    'avg_completion_tokens': round(totals['completion_tokens'] / calls, 1),
+                    'cache_hit_rate': round(totals['cache_hit_tokens'] / totals['prompt_tokens'], 3)
+                    if totals['prompt_tokens'] else 0.0,
+                }
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self._totals.clear()
+
+
+model_router = ModelRouter(
+    load_policies(os.environ.get("MODEL_ROUTING_POLICY")),
+    enabled=os.environ.get("MODEL_ROUTING", "false").lower() == "true",
+    log_path=os.environ.get("MODEL_ROUTING_LOG") or None
+)
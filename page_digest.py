@@ -0,0 +1,182 @@
+"""
+Precomputed page digests generated at ingest time.
+
+Whenever a page is fetched or refreshed, `DigestStore.schedule` builds a compact
+digest of it in a background thread: an outline, key facts and one-line section
+summaries. Digests are keyed by (page id, page version), so an unchanged page is
+never digested twice and a refreshed page gets a new digest.
+
+With a DeepSeek client the digest is written by the LLM once per page version
+(recorded under the `page_digest` route in `model_router`); without one a local
+extractive digest is built from the page text. The digest is also kept on the
+`PageRecord`, so it is saved with the page in snapshots and a restarted or
+sibling worker reuses it instead of calling the LLM again. Prompt
+building can then send the dense digest first and pull raw passages only for
+the parts of the page the question is actually about.
+"""
+
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from model_routing import PAGE_DIGEST, model_router
+from page_store import PageRecord
+
+SECTION_CHARS = 2000
+MAX_SECTIONS = 12
+MAX_KEY_FACTS = 8
+PASSAGE_CHARS = 500
+
+STOPWORDS = frozenset(
+    "about above after again also because been before being below between both could does doing during each "
+    "from further have having here into just more most other over same should some such than that their them "
+    "then there these they this those through under until very what when where which while with would your "
+    "page confluence tell show explain".split()
+)
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def digest_key(record: PageRecord) -> Tuple[str, str]:
+    """(page id, version) - pages without a version number are keyed by a hash of their body"""
+    import hashlib
+
+    version = str(record.version) if record.version else hashlib.blake2b(record.body, digest_size=8).hexdigest()
+    return record.id, version
+
+
+def query_terms(message: str) -> List[str]:
+    """Significant lower-case words of a question"""
+    return [word for word in re.findall(r"[a-z0-9][a-z0-9_-]{3,}", message.lower()) if word not in STOPWORDS]
+
+
+def select_passages(content: str, message: str, title: str = '', max_chars: int = 1000) -> List[str]:
+    """Return the passages of a page that mention the question's terms, best first
+
+    Words of the page title are ignored since they match everywhere. Returns nothing
+    when no passage matches, so raw text is only sent when needed.
+    """
+    title_terms = set(query_terms(title))
+    terms = [term for term in query_terms(message) if term not in title_terms]
+    if not terms:
+        return []
+
+    scored = []
+    for start in range(0, len(content), PASSAGE_CHARS):
+        passage = content[start:start + PASSAGE_CHARS]
+        passage_lower = passage.lower()
+        counts = [passage_lower.count(term) for term in terms]
+        if any(counts):
+            # Passages covering more distinct terms win over repetitions of one term
+            scored.append((-sum(1 for count in counts if count), -sum(counts), start, passage))
+
+    selected, used = [], 0
+    for _, _, start, passage in sorted(scored):
+        if used + len(passage) > max_chars:
+            break
+        selected.append(passage)
+        used += len(passage)
+    return selected
+
+
+def build_local_digest(title: str, content: str) -> str:
+    """Extractive digest: section lead sentences as outline/summaries plus fact-like sentences"""
+    sentences = [sentence.strip() for sentence in SENTENCE_SPLIT.split(content) if sentence.strip()]
+    key_facts = list(dict.fromkeys(
+        sentence for sentence in sentences
+        if len(sentence) < 300 and re.search(r'\d|:|\b(must|should|required|never|always)\b', sentence, re.IGNORECASE)
+    ))[:MAX_KEY_FACTS]
+
+    summaries = []
+    for start in range(0, min(len(content), SECTION_CHARS * MAX_SECTIONS), SECTION_CHARS):
+        section = content[start:start + SECTION_CHARS].strip()
+        lead = SENTENCE_SPLIT.split(section, maxsplit=1)[0][:200]
+        if lead and f"- {lead}" not in summaries:
+            summaries.append(f"- {lead}")
+
+    parts = [f"Outline of '{title}' ({len(content)} characters, {len(summaries)} sections):"]
+    parts.extend(summaries)
+    if key_facts:
+        parts.append("Key facts:")
+        parts.extend(f"- {fact}" for fact in key_facts)
+    return "\n".join(parts)
+
+
+def build_llm_digest(client, title: str, content: str) -> Optional[str]:
+    """Ask DeepSeek for an outline, key facts and section summaries of a page"""
+    start, response = time.perf_counter(), None
+    try:
+        response = client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": "You write dense digests of documentation for later question answering. "
+                                              "Output three parts: Outline (headings), Key facts (names, numbers, "
+                                              "commands, URLs, exactly as written) and Section summaries (one line "
+                                              "each). Max 300 words."},
+                {"role": "user", "content": f"Page: {title}\n\n{content[:SECTION_CHARS * MAX_SECTIONS]}"}
+            ],
+            stream=False,
+            **model_router.request_options(PAGE_DIGEST)
+        )
+    finally:
+        model_router.record(PAGE_DIGEST, time.perf_counter() - start, getattr(response, 'usage', None),
+                            error=response is None)
+    return response.choices[0].message.content.strip() or None
+
+
+class DigestStore:
+    """Process-wide cache of page digests, built in the background"""
+
+    def __init__(self, max_workers: int = 2):
+        self._digests: Dict[Tuple[str, str], str] = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._max_workers = max_workers
+        self._executor = None  # started by the first schedule(), so importing this module stays cheap
+
+    def get(self, record: PageRecord) -> Optional[str]:
+        """The digest for this version of the page, if it has been built (here or before a snapshot was saved)"""
+        return record.digest or self._digests.get(digest_key(record))
+
+    def schedule(self, record: PageRecord, client=None):
+        """Build a digest for this page version in the background unless one exists"""
+        if record.digest:
+            return
+        key = digest_key(record)
+        with self._lock:
+            if key in self._digests:
+                record.digest = self._digests[key]
+                return
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="page-digest")
+        self._executor.submit(self._build, key, record, client)
+
+    def _build(self, key: Tuple[str, str], record: PageRecord, client):
+        try:
+            content = record.content
+            digest = None
+            if client is not None:
+                try:
+                    digest = build_llm_digest(client, record.title, content)
+                except Exception as e:
+                    print(f"Warning: LLM digest failed for '{record.title}', using local digest: {e}")
+            digest = digest or build_local_digest(record.title, content)
+            with self._lock:
+                # Drop digests of older versions of the same page
+                for old_key in [old_key for old_key in self._digests if old_key[0] == key[0]]:
+                    del self._digests[old_key]
+                self._digests[key] = digest
+            record.digest = digest
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+
+digest_store = DigestStore()
@@ -0,0 +1,232 @@
+"""
+Memory-mapped page snapshots for warm restarts.
+
+A snapshot is a compact binary file holding the extracted text and metadata of
+cached Confluence pages together with a sorted key index. Opening a snapshot
+memory-maps the file instead of deserializing it, so a fresh process can answer
+from warm data within milliseconds and several worker processes share the same
+physical pages through the OS page cache.
+
+File layout (all integers little-endian):
+
+    header   magic (8s) | key count (I) | index offset (Q) | written at (d)
+    records  per page: compression (B) | version (I) | fetched at (d) | field lengths (IIIIQI) |
+             id | title | space_key | url | body | digest
+    index    per key, sorted by key bytes: key offset (Q) | key length (I) | record offset (Q)
+    keys     the UTF-8 encoded cache keys referenced by the index
+
+Each page is stored once; its cache keys (`space:title` and `id:<page id>`)
+point to the same record. Bodies are stored exactly as `PageRecord` keeps them in
+memory (compressed), so loading a page neither decompresses nor recompresses it.
+The page digest (if one was built) is stored too, so restarts and other workers
+do not digest the same page version again.
+
+`open_snapshot` notices when the file was replaced (another worker's save, or
+this process's own) and maps the new file. Saves merge with the snapshot as it
+was when they started, so of two concurrent saves the last writer wins.
+
+Pages fetched from Confluence more than `CONFLUENCE_SNAPSHOT_MAX_AGE` seconds ago
+(default one day) are not served and are dropped when the snapshot is rewritten,
+so edits reach users within that age even without webhooks.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from page_store import PageRecord, page_aliases
+
+MAGIC = b'CBSNAP5\0'
+HEADER = struct.Struct('<8sIQd')
+RECORD_HEADER = struct.Struct('<BIdIIIIQI')
+INDEX_ENTRY = struct.Struct('<QIQ')
+
+TEXT_FIELDS = ('id', 'title', 'space_key', 'url')
+
+# Seconds after which a snapshot copy of a page is no longer served (0 = no limit)
+MAX_AGE_SECONDS = float(os.environ.get("CONFLUENCE_SNAPSHOT_MAX_AGE", 86400))
+
+
+def write_snapshot(path: str, pages: Iterable[Tuple[str, Union[PageRecord, Dict]]]) -> int:
+    """Write (cache key, page record or dict) pairs to a snapshot file and return the number of pages
+
+    The file is written to a temporary path and atomically renamed, so readers that
+    already have the old snapshot mapped keep a consistent view.
+    """
+    records = []  # encoded page records, one per page id
+    record_by_id = {}  # page id -> index into records
+    key_to_record = {}  # cache key -> index into records
+
+    for cache_key, page_data in pages:
+        record = PageRecord.from_page(page_data)
+        if record.id not in record_by_id:
+            record_by_id[record.id] = len(records)
+            records.append(record)
+        record_index = record_by_id[record.id]
+        for key in [cache_key] + page_aliases(record):
+            key_to_record.setdefault(key, record_index)
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, 0, 0, 0.0))  # placeholder, rewritten below
+
+        record_offsets = []
+        for record in records:
+            fields = [getattr(record, field).encode('utf-8') for field in TEXT_FIELDS]
+            fields += [record.body, record.digest.encode('utf-8')]
+            record_offsets.append(f.tell())
+            f.write(RECORD_HEADER.pack(record.compression, record.version, record.fetched_at,
+                                       *(len(field) for field in fields)))
+            for field in fields:
+                f.write(field)
+
+        index_offset = f.tell()
+        encoded_keys = sorted(key.encode('utf-8') for key in key_to_record)
+        keys_offset = index_offset + INDEX_ENTRY.size * len(encoded_keys)
+        key_offset = keys_offset
+        for key in encoded_keys:
+            record_offset = record_offsets[key_to_record[key.decode('utf-8')]]
+            f.write(INDEX_ENTRY.pack(key_offset, len(key), record_offset))
+            key_offset += len(key)
+        for key in encoded_keys:
+            f.write(key)
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(encoded_keys), index_offset, time.time()))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class PageSnapshot:
+    """Read-only, memory-mapped view of a snapshot file
+
+    Lookups binary-search the key index directly in the mapped file and only decode
+    the fields of the page that was asked for.
+    """
+
+    def __init__(self, path: str, max_age: float = MAX_AGE_SECONDS):
+        self.path = path
+        self.max_age = max_age
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.file_id = (stat.st_ino, stat.st_mtime_ns)  # identifies the file that is mapped
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Pages invalidated since the snapshot was written (e.g. by a Confluence webhook)
+        self.stale_ids = set()
+
+        if len(self._mmap) < HEADER.size or self._mmap[:8] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a ConfluenceBot snapshot")
+        _, self._count, self._index_offset, self.written_at = HEADER.unpack_from(self._mmap, 0)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def _key_at(self, position: int) -> Tuple[bytes, int]:
+        key_offset, key_len, record_offset = INDEX_ENTRY.unpack_from(
+            self._mmap, self._index_offset + position * INDEX_ENTRY.size
+        )
+        return self._mmap[key_offset:key_offset + key_len], record_offset
+
+    def _find(self, key: str) -> Optional[int]:
+        """Binary-search the index for a key and return its record offset"""
+        target = key.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            mid_key, record_offset = self._key_at(mid)
+            if mid_key == target:
+                return record_offset
+            if mid_key < target:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def _read_record(self, offset: int) -> PageRecord:
+        compression, version, fetched_at, *lengths = RECORD_HEADER.unpack_from(self._mmap, offset)
+        position = offset + RECORD_HEADER.size
+        fields = []
+        for length in lengths:
+            fields.append(self._mmap[position:position + length])
+            position += length
+        *text_fields, body, digest = fields
+        return PageRecord(*(field.decode('utf-8') for field in text_fields), body, compression, version, fetched_at,
+                          digest.decode('utf-8'))
+
+    def _servable(self, record: PageRecord) -> bool:
+        """Not invalidated and not older than max_age"""
+        if record.id in self.stale_ids:
+            return False
+        return not self.max_age or time.time() - record.fetched_at <= self.max_age
+
+    def get(self, key: str) -> Optional[PageRecord]:
+        """Return the page stored under a cache key, or None"""
+        record_offset = self._find(key)
+        if record_offset is None:
+            return None
+        record = self._read_record(record_offset)
+        return record if self._servable(record) else None
+
+    def mark_stale(self, page_id: str):
+        """Stop serving a page whose snapshot copy is out of date"""
+        self.stale_ids.add(str(page_id))
+
+    def keys(self) -> Iterator[str]:
+        """Iterate over all cache keys in the snapshot"""
+        for position in range(self._count):
+            yield self._key_at(position)[0].decode('utf-8')
+
+    def items(self) -> Iterator[Tuple[str, PageRecord]]:
+        """Iterate over (cache key, page record) pairs that are still servable"""
+        for position in range(self._count):
+            key, record_offset = self._key_at(position)
+            record = self._read_record(record_offset)
+            if self._servable(record):
+                yield key.decode('utf-8'), record
+
+    def close(self):
+        """Unmap the snapshot file"""
+        self._mmap.close()
+
+
+_open_snapshots: Dict[str, PageSnapshot] = {}
+_open_snapshots_lock = threading.Lock()
+
+
+def open_snapshot(path: str) -> Optional[PageSnapshot]:
+    """Open a snapshot once per process so every bot instance shares one mapping
+
+    The mapping is replaced when the file on disk was replaced since it was opened;
+    pages invalidated in the old mapping stay invalidated. Returns None if the file
+    does not exist or is not a valid snapshot.
+    """
+    path = os.path.abspath(path)
+    with _open_snapshots_lock:
+        snapshot = _open_snapshots.get(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return snapshot
+        if snapshot is not None and snapshot.file_id == (stat.st_ino, stat.st_mtime_ns):
+            return snapshot
+        try:
+            reopened = PageSnapshot(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Warning: Could not open page snapshot {path}: {e}")
+            return snapshot
+        # The old mapping is left to the garbage collector: other threads may still be reading it
+        if snapshot is not None:
+            reopened.stale_ids |= snapshot.stale_ids
+        _open_snapshots[path] = reopened
+        return reopened
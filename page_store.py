@@ -0,0 +1,293 @@
+"""
+Compact in-memory storage for cached Confluence pages.
+
+`PageRecord` replaces the five-key page dict: it uses `__slots__`, interns the
+space key and title, and keeps the page body compressed (zlib or lzma from the
+standard library), decompressing it transparently when `content` is read.
+Records still support `record['title']` / `record.get('title')` so existing
+code that treats pages as dicts keeps working.
+
+Records are canonical per page id across the whole process: every
+`ConfluenceBot` that loads the same page shares one `PageRecord`. Each bot's
+`PageStore` holds one entry per page id plus alias keys (`space:title`,
+`id:<page id>` and whatever key the page was cached under) pointing to it.
+"""
+
+import lzma
+import os
+import sys
+import threading
+import time
+import weakref
+import zlib
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+
+COMPRESSION_CODECS = {'none': COMPRESSION_NONE, 'zlib': COMPRESSION_ZLIB, 'lzma': COMPRESSION_LZMA}
+
+# Bodies shorter than this are stored uncompressed; compression would not pay for its header
+COMPRESS_MIN_BYTES = int(os.environ.get("CONFLUENCE_COMPRESS_MIN_BYTES", 256))
+DEFAULT_COMPRESSION = COMPRESSION_CODECS.get(os.environ.get("CONFLUENCE_PAGE_COMPRESSION", "zlib").lower(), COMPRESSION_ZLIB)
+
+PAGE_FIELDS = ('id', 'title', 'content', 'space_key', 'url', 'version')
+
+
+def compress_body(content: str, compression: int = DEFAULT_COMPRESSION) -> Tuple[bytes, int]:
+    """Encode and compress a page body, returning (stored bytes, compression flag)"""
+    body = content.encode('utf-8')
+    if len(body) < COMPRESS_MIN_BYTES or compression == COMPRESSION_NONE:
+        return body, COMPRESSION_NONE
+    if compression == COMPRESSION_LZMA:
+        return lzma.compress(body), COMPRESSION_LZMA
+    return zlib.compress(body), COMPRESSION_ZLIB
+
+
+def decompress_body(body: bytes, compression: int) -> str:
+    """Inverse of compress_body"""
+    if compression == COMPRESSION_ZLIB:
+        body = zlib.decompress(body)
+    elif compression == COMPRESSION_LZMA:
+        body = lzma.decompress(body)
+    return body.decode('utf-8')
+
+
+class PageRecord:
+    """A cached Confluence page with a compressed body"""
+
+    __slots__ = ('id', 'title', 'space_key', 'url', 'body', 'compression', 'version', 'fetched_at', 'digest',
+                 '__weakref__')
+
+    def __init__(self, id: str, title: str, space_key: str, url: str, body: bytes, compression: int, version: int = 0,
+                 fetched_at: Optional[float] = None, digest: str = ''):
+        self.id = sys.intern(str(id))
+        self.title = sys.intern(title)
+        self.space_key = sys.intern(space_key)
+        self.url = url
+        self.body = body
+        self.compression = compression
+        self.version = version
+        # When the page was last fetched from Confluence (epoch seconds); bounds snapshot staleness
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        # Digest of this version of the page (see page_digest); saved with the record in snapshots
+        self.digest = digest
+
+    @classmethod
+    def from_page(cls, page_data: Union['PageRecord', Dict]) -> 'PageRecord':
+        """Build a record from a page dict (records are returned unchanged)"""
+        if isinstance(page_data, PageRecord):
+            return page_data
+        body, compression = compress_body(page_data.get('content') or '')
+        return cls(page_data['id'], page_data['title'], page_data['space_key'], page_data.get('url') or '',
+                   body, compression, int(page_data.get('version') or 0), page_data.get('fetched_at'),
+                   page_data.get('digest') or '')
+
+    @property
+    def content(self) -> str:
+        return decompress_body(self.body, self.compression)
+
+    def __getitem__(self, key: str):
+        if key not in PAGE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in PAGE_FIELDS else default
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in PAGE_FIELDS}
+
+    def same_page(self, other: 'PageRecord') -> bool:
+        return (self.id, self.title, self.space_key, self.url, self.version, self.body) == \
+            (other.id, other.title, other.space_key, other.url, other.version, other.body)
+
+    def __repr__(self):
+        return f"PageRecord(id={self.id!r}, title={self.title!r}, space_key={self.space_key!r})"
+
+
+# Process-wide registry of canonical records, so identical pages are stored once
+_canonical_records: 'weakref.WeakValueDictionary[str, PageRecord]' = weakref.WeakValueDictionary()
+_canonical_lock = threading.Lock()
+
+
+def canonical_record(page_data: Union[PageRecord, Dict]) -> PageRecord:
+    """Return the shared record for a page, replacing it if the page changed"""
+    record = PageRecord.from_page(page_data)
+    with _canonical_lock:
+        existing = _canonical_records.get(record.id)
+        if existing is not None and existing.same_page(record):
+            existing.fetched_at = max(existing.fetched_at, record.fetched_at)
+            existing.digest = existing.digest or record.digest
+            return existing
+        _canonical_records[record.id] = record
+        return record
+
+
+def page_aliases(record: PageRecord) -> List[str]:
+    """Cache keys a page is always reachable under"""
+    return [f"{record.space_key}:{record.title}", f"id:{record.id}"]
+
+
+def normalize_title(title: str) -> str:
+    """Case- and whitespace-insensitive form of a page title used for lookups"""
+    return ' '.join(title.split()).casefold()
+
+
+class PageStore:
+    """Per-bot page cache: one canonical entry per page id, reachable by alias keys
+
+    Secondary indexes from alias key (`space:title`, `id:<page id>`, the key a page
+    was stored under) and from normalized title to page id are maintained on every
+    insert and eviction, so reference lookups are O(1) however many pages are cached.
+
+    Iteration order of `values()` is least recently used first. When `max_pages` is
+    set, storing a page beyond that evicts the least recently used one. A store may
+    be shared by threads (webhook invalidation, batch workers).
+    """
+
+    def __init__(self, max_pages: int = 0):
+        self.max_pages = max_pages
+        self._lock = threading.RLock()
+        self._records: Dict[str, PageRecord] = {}
+        self._aliases: Dict[str, str] = {}
+        self._keys_by_id: Dict[str, List[str]] = {}
+        self._titles: Dict[str, Dict[str, None]] = {}  # normalized title -> ordered set of page ids
+
+    def __setitem__(self, cache_key: str, page_data: Union[PageRecord, Dict]):
+        record = canonical_record(page_data)
+        with self._lock:
+            previous = self._records.get(record.id)
+            if previous is not None and (previous.title, previous.space_key) != (record.title, record.space_key):
+                # Renamed or moved: the old title and `space:title` alias must not resolve to it any more
+                self._unindex_title(previous)
+                for key in page_aliases(previous):
+                    if self._aliases.get(key) == record.id:
+                        del self._aliases[key]
+                        self._keys_by_id[record.id].remove(key)
+
+            self._records.pop(record.id, None)
+            self._records[record.id] = record
+            self._titles.setdefault(normalize_title(record.title), {})[record.id] = None
+
+            keys = self._keys_by_id.setdefault(record.id, [])
+            for key in [cache_key] + page_aliases(record):
+                old_id = self._aliases.get(key)
+                if old_id == record.id:
+                    continue
+                if old_id is not None:
+                    self._keys_by_id[old_id].remove(key)
+                self._aliases[key] = record.id
+                keys.append(key)
+
+            if self.max_pages:
+                while len(self._records) > self.max_pages:
+                    self.evict(next(iter(self._records)))
+
+    def __getitem__(self, cache_key: str) -> PageRecord:
+        record = self.get(cache_key)
+        if record is None:
+            raise KeyError(cache_key)
+        return record
+
+    def get(self, cache_key: str, default=None) -> Optional[PageRecord]:
+        with self._lock:
+            page_id = self._aliases.get(cache_key)
+            if page_id is None:
+                return default
+            return self._records.get(page_id, default)
+
+    def find(self, reference: str) -> Optional[PageRecord]:
+        """Resolve a page reference (alias key, page id, title or `space:title`) in O(1)
+
+        Titles match case- and whitespace-insensitively; a hit marks the page as recently used.
+        """
+        with self._lock:
+            page_id = self._aliases.get(reference)
+            if page_id is None and reference.isdigit() and reference in self._records:
+                page_id = reference
+            if page_id is None:
+                page_id = self._find_title(normalize_title(reference), None)
+            if page_id is None and ':' in reference:
+                space_key, _, title = reference.partition(':')
+                page_id = self._find_title(normalize_title(title), space_key.strip())
+            if page_id is None:
+                return None
+
+            record = self._records.pop(page_id)
+            self._records[page_id] = record
+            return record
+
+    def _find_title(self, normalized: str, space_key: Optional[str]) -> Optional[str]:
+        page_ids = self._titles.get(normalized)
+        if not page_ids:
+            return None
+        for page_id in reversed(page_ids):
+            if space_key is None or self._records[page_id].space_key == space_key:
+                return page_id
+        return None
+
+    def _unindex_title(self, record: PageRecord):
+        normalized = normalize_title(record.title)
+        page_ids = self._titles.get(normalized)
+        if page_ids is not None:
+            page_ids.pop(record.id, None)
+            if not page_ids:
+                del self._titles[normalized]
+
+    def evict(self, page_id: str) -> Optional[PageRecord]:
+        """Remove a page and all of its alias keys"""
+        with self._lock:
+            record = self._records.pop(page_id, None)
+            if record is None:
+                return None
+            for key in self._keys_by_id.pop(page_id, []):
+                del self._aliases[key]
+            self._unindex_title(record)
+            return record
+
+    def __contains__(self, cache_key: str) -> bool:
+        return self.get(cache_key) is not None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __bool__(self) -> bool:
+        return bool(self._records)
+
+    def keys(self) -> List[str]:
+        """All alias keys"""
+        with self._lock:
+            return list(self._aliases)
+
+    def values(self) -> List[PageRecord]:
+        """One record per cached page"""
+        with self._lock:
+            return list(self._records.values())
+
+    def recent(self, limit: int) -> List[PageRecord]:
+        """Up to `limit` most recently used pages, oldest first, without walking the cache"""
+        with self._lock:
+            return list(islice(reversed(self._records.values()), limit))[::-1]
+
+    def titles(self) -> List[str]:
+        """Titles of all cached pages"""
+        with self._lock:
+            return [record.title for record in self._records.values()]
+
+    def items(self) -> List[Tuple[str, PageRecord]]:
+        """(alias key, record) pairs for every alias"""
+        with self._lock:
+            return [(key, self._records[page_id]) for key, page_id in self._aliases.items()]
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._aliases.clear()
+            self._keys_by_id.clear()
+            self._titles.clear()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
@@ -0,0 +1,140 @@
+"""
+On-demand per-request profiling for the chat pipeline.
+
+A request is profiled when any of these holds:
+
+- `CHAT_PROFILE=true` (every request)
+- a random draw falls under `CHAT_PROFILE_SAMPLE_PERCENT` (e.g. `1` profiles 1% of requests)
+- the message starts with `!profile` and `CHAT_PROFILE_ALLOW_DEBUG_FLAG=true`
+
+Profiled requests run under a low-overhead sampling profiler, a background
+thread that records the request thread's stack every `CHAT_PROFILE_INTERVAL_MS`,
+plus `tracemalloc`. Two files are written to `CHAT_PROFILE_DIR`:
+
+- `<request>.collapsed` - stacks in the collapsed format read by flamegraph.pl,
+  speedscope and inferno (`frame;frame;frame count`)
+- `<request>.alloc.txt` - peak traced memory and the top allocation sites
+
+Unsampled requests only pay for one flag check and one random draw, and
+`tracemalloc`/`uuid` are only imported once a request is actually profiled.
+"""
+
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ALL = os.environ.get("CHAT_PROFILE", "false").lower() == "true"
+SAMPLE_RATE = float(os.environ.get("CHAT_PROFILE_SAMPLE_PERCENT", 0)) / 100
+ALLOW_DEBUG_FLAG = os.environ.get("CHAT_PROFILE_ALLOW_DEBUG_FLAG", "false").lower() == "true"
+PROFILE_DIR = os.environ.get("CHAT_PROFILE_DIR", "profiles")
+INTERVAL_SECONDS = float(os.environ.get("CHAT_PROFILE_INTERVAL_MS", 5)) / 1000
+
+DEBUG_FLAG = "!profile"
+TOP_ALLOCATIONS = 25
+
+# tracemalloc is process-wide; only one profiled request at a time traces allocations
+_tracemalloc_lock = threading.Lock()
+
+
+def strip_debug_flag(message: str) -> Tuple[str, bool]:
+    """Remove a leading `!profile` flag, returning (message, profiling requested)"""
+    if ALLOW_DEBUG_FLAG and message.startswith(DEBUG_FLAG):
+        return message[len(DEBUG_FLAG):].strip(), True
+    return message, False
+
+
+def should_profile(force: bool = False) -> bool:
+    return force or PROFILE_ALL or (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)
+
+
+class SamplingProfiler:
+    """Sample one thread's Python stack at a fixed interval from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float = INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="chat-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _write_allocations(path: str, snapshot: 'tracemalloc.Snapshot', peak_bytes: int, elapsed: float):
+    with open(path, 'w') as f:
+        f.write(f"elapsed: {elapsed * 1000:.1f} ms\n")
+        f.write(f"peak traced memory: {peak_bytes / 1024:.1f} KiB\n\n")
+        f.write(f"top {TOP_ALLOCATIONS} allocation sites still held at the end of the request:\n")
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+
+
+@contextmanager
+def profile_request(label: str = "chat", force: bool = False) -> Iterator[Optional[str]]:
+    """Profile the enclosed block if sampled; yields the output path prefix or None"""
+    if not should_profile(force):
+        yield None
+        return
+    import tracemalloc
+    import uuid
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    prefix = os.path.join(PROFILE_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{label}_{uuid.uuid4().hex[:8]}")
+
+    profiler = SamplingProfiler(threading.get_ident())
+    trace_allocations = _tracemalloc_lock.acquire(blocking=False)
+    if trace_allocations and tracemalloc.is_tracing():
+        _tracemalloc_lock.release()  # someone else is already tracing
+        trace_allocations = False
+    if trace_allocations:
+        tracemalloc.start()
+    start = time.perf_counter()
+    profiler.start()
+    try:
+        yield prefix
+    finally:
+        profiler.stop()
+        elapsed = time.perf_counter() - start
+        try:
+            profiler.write_collapsed(f"{prefix}.collapsed")
+            if trace_allocations:
+                snapshot = tracemalloc.take_snapshot()
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                _write_allocations(f"{prefix}.alloc.txt", snapshot, peak_bytes, elapsed)
+            logger.info("profiled %s in %.1f ms: %s.*", label, elapsed * 1000, prefix)
+        except OSError as e:
+            print(f"Warning: Could not write profile {prefix}: {e}")
+        finally:
+            if trace_allocations:
+                tracemalloc.stop()
+                _tracemalloc_lock.release()
@@ -0,0 +1,252 @@
+"""
+Adaptive concurrency control for Confluence API traffic.
+
+Every Confluence request - from the threaded bot through `LimitedHTTPAdapter`,
+or from the async bot through `AsyncConfluenceClient` - takes a slot from one
+process-wide `AdaptiveLimiter` first. The limit follows AIMD:
+
+- a healthy response adds `1 / limit` (about +1 per limit's worth of requests)
+- a 429/503 multiplies the limit by `backoff` (at most once per cooldown, so a
+  burst of rejected in-flight requests counts as one signal), and `Retry-After`
+  pauses all new requests until it has passed
+- `X-RateLimit-NearLimit: true` or a low `X-RateLimit-Remaining` stops growth
+
+Requests run in one of two lanes. Interactive requests (a user is waiting) are
+always granted before background ones (title catalog listing, webhook refreshes,
+batch pre-warming), and background work may not take the last `reserve` slots.
+The lane is taken from `request_priority`, a context variable, so it follows
+the code path without threading a parameter through every call:
+
+    with background_priority():
+        catalog.sync_space(confluence, "DEV")
+"""
+
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+THROTTLE_STATUSES = (429, 503)
+
+ADAPTIVE_LIMIT_ENABLED = os.environ.get("CONFLUENCE_ADAPTIVE_LIMIT", "true").lower() == "true"
+MAX_RETRIES = int(os.environ.get("CONFLUENCE_MAX_RETRIES", 3))
+
+request_priority: contextvars.ContextVar = contextvars.ContextVar("confluence_request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Run the enclosed Confluence calls in the background lane"""
+    token = request_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def retry_after_seconds(headers: Mapping[str, str], default: float = 1.0) -> float:
+    """Seconds to wait according to a `Retry-After` header (delta-seconds or HTTP date)"""
+    value = headers.get('Retry-After')
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime  # only HTTP-date values need it; costs ~10 ms to import
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with an interactive and a background lane"""
+
+    def __init__(self, initial: int = 8, min_limit: int = 2, max_limit: int = 32,
+                 backoff: float = 0.5, cooldown: float = 1.0, reserve: int = 1):
+        # The limit never drops to the reserve, so background work always keeps at least one slot
+        self.min_limit = max(min_limit, reserve + 1)
+        self.max_limit = max(max_limit, self.min_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.reserve = reserve
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.stats: Dict[str, int] = {'requests': 0, 'throttled': 0, 'decreases': 0}
+        self._last_decrease = 0.0
+        self._waiters: List = []  # heap of (priority, seq, wake callback)
+        self._sequence = itertools.count()
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def _capacity(self, priority: int) -> int:
+        limit = int(self.limit)
+        return max(0, limit - self.reserve) if priority == BACKGROUND else limit
+
+    def _can_start(self, priority: int) -> bool:
+        return time.monotonic() >= self.blocked_until and self.in_flight < self._capacity(priority)
+
+    def _grant(self):
+        """Hand free slots to waiters, highest priority first (lock held)"""
+        while self._waiters and self._can_start(self._waiters[0][0]):
+            _, _, wake = heapq.heappop(self._waiters)
+            self.in_flight += 1
+            wake()
+        if self._waiters and time.monotonic() < self.blocked_until and self._timer is None:
+            self._timer = threading.Timer(self.blocked_until - time.monotonic(), self._unblock)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _unblock(self):
+        with self._lock:
+            self._timer = None
+            self._grant()
+
+    def _enqueue(self, priority: int, wake: Callable[[], None]) -> bool:
+        """Take a slot now (True) or queue `wake` to be called once one is granted (False)"""
+        with self._lock:
+            self.stats['requests'] += 1
+            if not self._waiters and self._can_start(priority):
+                self.in_flight += 1
+                return True
+            heapq.heappush(self._waiters, (priority, next(self._sequence), wake))
+            self._grant()
+            return False
+
+    def _cancel(self, wake: Callable[[], None]) -> bool:
+        """Withdraw a queued waiter; False if it was already granted a slot"""
+        with self._lock:
+            for index, waiter in enumerate(self._waiters):
+                if waiter[2] is wake:
+                    self._waiters.pop(index)
+                    heapq.heapify(self._waiters)
+                    return True
+            return False
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._grant()
+
+    @contextmanager
+    def slot(self, priority: Optional[int] = None) -> Iterator[None]:
+        """Hold one slot for a blocking request"""
+        priority = request_priority.get() if priority is None else priority
+        granted = threading.Event()
+        if not self._enqueue(priority, granted.set):
+            granted.wait()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: Optional[int] = None):
+        """Hold one slot for an awaited request without blocking the event loop"""
+        import asyncio
+
+        priority = request_priority.get() if priority is None else priority
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        if not self._enqueue(priority, wake):
+            try:
+                await granted
+            except asyncio.CancelledError:
+                if not self._cancel(wake):
+                    self.release()
+                raise
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_response(self, status: int, headers: Mapping[str, str]):
+        """Adjust the limit from one response's status and rate-limit headers"""
+        now = time.monotonic()
+        with self._lock:
+            if status in THROTTLE_STATUSES:
+                self.stats['throttled'] += 1
+                self.blocked_until = max(self.blocked_until, now + retry_after_seconds(headers, 0.0))
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                    self._last_decrease = now
+                    self.stats['decreases'] += 1
+                return
+
+            near_limit = str(headers.get('X-RateLimit-NearLimit', '')).lower() == 'true'
+            remaining = headers.get('X-RateLimit-Remaining')
+            if remaining is not None and remaining.isdigit() and int(remaining) < self.limit:
+                near_limit = True
+            if status < 500 and not near_limit:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._grant()
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'queued': len(self._waiters),
+                'blocked_for_s': round(max(0.0, self.blocked_until - time.monotonic()), 2),
+                **self.stats
+            }
+
+
+class LimitedHTTPAdapter:
+    """Transport adapter for a requests session that routes every request through an AdaptiveLimiter
+
+    Wraps a regular `HTTPAdapter`; throttled requests are retried after
+    `Retry-After` up to `max_retries` times.
+    """
+
+    def __init__(self, adapter, limiter: AdaptiveLimiter, max_retries: int = 3):
+        self.adapter = adapter
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    def send(self, request, **kwargs) -> Any:
+        for attempt in range(self.max_retries + 1):
+            with self.limiter.slot():
+                response = self.adapter.send(request, **kwargs)
+            self.limiter.on_response(response.status_code, response.headers)
+            if response.status_code not in THROTTLE_STATUSES or attempt == self.max_retries:
+                break
+            response.close()
+            time.sleep(retry_after_seconds(response.headers, 2 ** attempt))
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+def limited_session(limiter: Optional[AdaptiveLimiter] = None):
+    """A requests session whose traffic goes through the shared Confluence limiter"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = LimitedHTTPAdapter(HTTPAdapter(), limiter or confluence_limiter, MAX_RETRIES)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+confluence_limiter = AdaptiveLimiter(
+    initial=int(os.environ.get("CONFLUENCE_CONCURRENCY_INITIAL", 8)),
+    min_limit=int(os.environ.get("CONFLUENCE_CONCURRENCY_MIN", 2)),
+    max_limit=int(os.environ.get("CONFLUENCE_CONCURRENCY_MAX", 32))
+)
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Conversation Replay
+
+Re-runs saved conversations through ConfluenceBot.chat against stubbed
+Confluence and DeepSeek clients to catch performance regressions. Outbound
+calls are counted and answered locally after a simulated delay, so a replay
+measures the bot's own overhead and how many remote calls it would make.
+
+The corpus is any mix of:
+
+- `save_conversation` files (`confluence_bot_conversation_*.json`)
+- JSONL transcripts with one turn per line: {"user": "...", "bot": "...",
+  "timestamp": "2024-01-01 12:00:00", "conversation_id": "..."}; `question` /
+  `answer` (batch.py output) are accepted too. Turns are grouped by
+  `conversation_id`, otherwise each file is one conversation.
+
+DeepSeek answers with the recorded bot reply for a turn when there is one.
+Confluence serves pages from `--pages` (a JSON list of {id, title, space_key,
+content}) or synthesizes a page for any title or id.
+
+Gaps between turns follow the recorded timestamps divided by `--speed`
+(60 replays a minute of conversation per second; 0 disables waiting).
+
+Usage:
+    python replay.py conversations/ --save-baseline replay_baseline.json
+    python replay.py conversations/ --baseline replay_baseline.json --workers 8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+
+from batch import percentile
+from chatbot import ConfluenceBot
+from model_routing import model_router
+from page_store import PageStore
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Metrics compared with the baseline and whether a higher value is worse
+BASELINE_METRICS = {
+    'latency_p50_ms': True,
+    'latency_p95_ms': True,
+    'confluence_calls': True,
+    'llm_calls': True,
+    'cache_hit_rate': False,
+    'prompt_cache_hit_rate': False,
+}
+
+# Latency differences below this are noise, whatever the relative tolerance
+LATENCY_SLACK_MS = 5.0
+
+# The stub LLM's prompt cache matches prefixes in units of ~64 tokens, as DeepSeek's does
+PROMPT_CACHE_UNIT = 256
+
+
+def load_conversations(paths: Iterable[str]) -> List[List[Dict]]:
+    """Read conversations (lists of turns) from files and directories"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith(('.json', '.jsonl')))
+        else:
+            files.append(path)
+
+    conversations = []
+    for file_path in files:
+        with open(file_path) as f:
+            if file_path.endswith('.jsonl'):
+                grouped: Dict[str, List[Dict]] = {}
+                for line in f:
+                    if line.strip():
+                        turn = json.loads(line)
+                        grouped.setdefault(str(turn.get('conversation_id', '')), []).append(turn)
+                turn_lists = list(grouped.values())
+            else:
+                data = json.load(f)
+                turn_lists = [data.get('conversation', [])] if isinstance(data, dict) else []  # e.g. a --pages file
+
+        for turns in turn_lists:
+            conversation = [
+                {'user': turn.get('user') or turn.get('question'),
+                 'bot': turn.get('bot') or turn.get('answer'),
+                 'timestamp': turn.get('timestamp')}
+                for turn in turns if turn.get('user') or turn.get('question')
+            ]
+            if conversation:
+                conversations.append(conversation)
+    return conversations
+
+
+class CallCounter:
+    """Thread-safe counts of outbound calls per client method"""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def total(self, prefix: str) -> int:
+        return sum(count for name, count in self.counts.items() if name.startswith(prefix))
+
+
+class StubConfluence:
+    """Answers the Confluence client calls ConfluenceBot makes, after a simulated delay"""
+
+    def __init__(self, calls: CallCounter, latency: float, pages: Optional[List[Dict]] = None):
+        self.calls = calls
+        self.latency = latency
+        self.pages = pages
+        self.by_id = {str(page['id']): page for page in pages or []}
+
+    def _call(self, name: str):
+        self.calls.record(f"confluence.{name}")
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _synthetic_page(self, title: str, space_key: str) -> Dict:
+        page_id = str(int(hashlib.md5(f"{space_key}:{title}".encode('utf-8')).hexdigest()[:8], 16))
+        content = f"{title}. " + f"This page documents {title} in the {space_key} space. " * 40
+        return {'id': page_id, 'title': title, 'space_key': space_key, 'content': content}
+
+    def _api_page(self, page: Dict) -> Dict:
+        return {
+            'id': str(page['id']), 'title': page['title'], 'space': {'key': page['space_key']},
+            'body': {'storage': {'value': f"<p>{page['content']}</p>"}},
+            'version': {'number': page.get('version', 1)},
+            '_links': {'webui': f"/spaces/{page['space_key']}/pages/{page['id']}"},
+        }
+
+    def get_page_by_title(self, space, title, expand=None):
+        self._call('get_page_by_title')
+        if self.pages is None:
+            page = self._synthetic_page(title, space)
+            self.by_id.setdefault(page['id'], page)
+            return self._api_page(page)
+        for page in self.pages:
+            if page['space_key'] == space and page['title'] == title:
+                return self._api_page(page)
+        return None
+
+    def get_page_by_id(self, page_id, expand=None):
+        self._call('get_page_by_id')
+        page = self.by_id.get(str(page_id))
+        if page is None and self.pages is None:
+            page = self._synthetic_page(f"Page {page_id}", "DOCS")
+            page['id'] = str(page_id)
+        return self._api_page(page) if page else None
+
+    def get_all_pages_from_space(self, space, start=0, limit=500, **kwargs):
+        self._call('get_all_pages_from_space')
+        pages = [page for page in self.by_id.values() if page['space_key'] == space]
+        return [{'id': page['id'], 'title': page['title']} for page in pages[start:start + limit]]
+
+    def cql(self, cql, limit=5, **kwargs):
+        self._call('cql')
+        results = [{'content': {'type': 'page', 'id': page['id'], 'title': page['title'],
+                                'space': {'key': page['space_key']}, '_links': {}}}
+                   for page in list(self.by_id.values())[:limit]]
+        return {'results': results}
+
+
+class StubDeepSeek:
+    """OpenAI-compatible client that returns recorded answers after a simulated delay
+
+    Usage includes `prompt_cache_hit_tokens` from a simulated prefix cache, which
+    (like DeepSeek's) only reuses whole units of a prompt prefix seen before.
+    """
+
+    def __init__(self, calls: CallCounter, latency: float, answers: Dict[str, str],
+                 prompt_cache: Optional[set] = None):
+        self.calls = calls
+        self.latency = latency
+        self.answers = answers
+        self.prompt_cache = prompt_cache if prompt_cache is not None else set()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _cached_prefix_chars(self, messages: List[Dict]) -> int:
+        """Length of the prompt prefix already in the cache; records this prompt's prefixes"""
+        prompt = "".join(f"{m['role']}\n{m['content']}\n" for m in messages).encode()
+        digest, hit = hashlib.blake2b(), 0
+        for start in range(0, len(prompt) - PROMPT_CACHE_UNIT + 1, PROMPT_CACHE_UNIT):
+            digest.update(prompt[start:start + PROMPT_CACHE_UNIT])
+            key = digest.copy().digest()
+            if hit == start and key in self.prompt_cache:
+                hit = start + PROMPT_CACHE_UNIT
+            self.prompt_cache.add(key)
+        return hit
+
+    def _create(self, model=None, messages=None, **kwargs):
+        self.calls.record("llm.chat.completions.create")
+        if self.latency:
+            time.sleep(self.latency)
+        question = next((m['content'] for m in reversed(messages or []) if m['role'] == 'user'), '')
+        # The bot may append a note to the question (e.g. that it loaded a page)
+        answer = self.answers.get(question) or next(
+            (answer for recorded, answer in self.answers.items() if question.startswith(recorded)),
+            f"Recorded answer unavailable; replying to: {question[:80]}")
+        prompt_tokens = sum(len(m['content']) for m in messages or []) // 4
+        cache_hit_tokens = min(prompt_tokens, self._cached_prefix_chars(messages or []) // 4)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=answer))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(answer) // 4,
+                                  prompt_cache_hit_tokens=cache_hit_tokens,
+                                  prompt_cache_miss_tokens=prompt_tokens - cache_hit_tokens),
+        )
+
+
+class CountingPageStore(PageStore):
+    """Shared page cache that counts reference lookups served without a fetch"""
+
+    def __init__(self, max_pages: int = 0):
+        super().__init__(max_pages)
+        self.hits = 0
+        self.misses = 0
+
+    def record_lookup(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+class ReplayBot(ConfluenceBot):
+    """ConfluenceBot that records whether page references were served from the cache"""
+
+    def load_page_from_reference(self, page_reference: str) -> Optional[Dict]:
+        cached_page = self.confluence_content_cache.find(page_reference)
+        self.confluence_content_cache.record_lookup(cached_page is not None)
+        return cached_page or super().load_page_from_reference(page_reference)
+
+
+class ReplayRunner:
+    """Replay conversations concurrently and collect latency, cache and call metrics"""
+
+    def __init__(self, workers: int = 4, speed: float = 60.0, confluence_latency_ms: float = 50,
+                 llm_latency_ms: float = 300, pages: Optional[List[Dict]] = None):
+        self.workers = workers
+        self.speed = speed
+        self.confluence_latency = confluence_latency_ms / 1000
+        self.llm_latency = llm_latency_ms / 1000
+        self.pages = pages
+        self.calls = CallCounter()
+        self.page_cache = CountingPageStore(max_pages=int(os.environ.get("CONFLUENCE_CACHE_MAX_PAGES", 0)))
+        self.prompt_cache: set = set()  # shared by all conversations, like the upstream cache
+        self.latencies: List[float] = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _wait(self, previous: Optional[str], current: Optional[str]):
+        """Sleep for the recorded gap between two turns, compressed by `speed`"""
+        if not self.speed or not previous or not current:
+            return
+        try:
+            gap = (datetime.strptime(current, TIMESTAMP_FORMAT) - datetime.strptime(previous, TIMESTAMP_FORMAT)).total_seconds()
+        except ValueError:
+            return
+        if gap > 0:
+            time.sleep(gap / self.speed)
+
+    def replay(self, conversation: List[Dict], confluence: StubConfluence):
+        """Replay one conversation's user turns in order through a fresh bot"""
+        answers = {turn['user']: turn['bot'] for turn in conversation if turn.get('bot')}
+        bot = ReplayBot("ReplayBot", use_llm=True, page_cache=self.page_cache)
+        bot.page_snapshot = None  # replays start from a cold cache, independent of local snapshots
+        bot.confluence = confluence
+        bot.deepseek_client = StubDeepSeek(self.calls, self.llm_latency, answers, self.prompt_cache)
+
+        previous = None
+        for turn in conversation:
+            self._wait(previous, turn.get('timestamp'))
+            previous = turn.get('timestamp')
+            start = time.perf_counter()
+            try:
+                bot.chat(turn['user'])
+                error = False
+            except Exception as e:
+                print(f"Error replaying turn {turn['user'][:40]!r}: {e}", file=sys.stderr)
+                error = True
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.latencies.append(elapsed_ms)
+                self.errors += error
+
+    def run(self, conversations: List[List[Dict]]) -> Dict:
+        """Replay all conversations and return the metrics"""
+        confluence = StubConfluence(self.calls, self.confluence_latency, self.pages)
+        model_router.reset()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in [executor.submit(self.replay, conversation, confluence) for conversation in conversations]:
+                future.result()
+        elapsed = time.perf_counter() - start
+
+        lookups = self.page_cache.hits + self.page_cache.misses
+        routes = model_router.summary()
+        prompt_tokens = sum(stats['calls'] * stats['avg_prompt_tokens'] for stats in routes.values())
+        cached_tokens = sum(stats['calls'] * stats['avg_prompt_tokens'] * stats['cache_hit_rate'] for stats in routes.values())
+        return {
+            'conversations': len(conversations),
+            'turns': len(self.latencies),
+            'errors': self.errors,
+            'elapsed_s': round(elapsed, 2),
+            'latency_p50_ms': round(percentile(self.latencies, 0.5), 1),
+            'latency_p95_ms': round(percentile(self.latencies, 0.95), 1),
+            'cache_hit_rate': round(self.page_cache.hits / lookups, 3) if lookups else 1.0,
+            'confluence_calls': self.calls.total('confluence.'),
+            'llm_calls': self.calls.total('llm.'),
+            'calls': dict(sorted(self.calls.counts.items())),
+            'prompt_cache_hit_rate': round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+            'llm_routes': routes,
+        }
+
+
+def compare_to_baseline(metrics: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Describe every metric that is worse than the baseline by more than `tolerance`"""
+    regressions = []
+    for name, higher_is_worse in BASELINE_METRICS.items():
+        if name not in baseline:
+            continue
+        current, reference = metrics[name], baseline[name]
+        if higher_is_worse:
+            limit = reference * (1 + tolerance) + (LATENCY_SLACK_MS if name.endswith('_ms') else 0)
+            if current > limit:
+                regressions.append(f"{name} {current} > {limit:.1f} (baseline {reference})")
+        else:
+            limit = reference * (1 - tolerance)
+            if current < limit:
+                regressions.append(f"{name} {current} < {limit:.3f} (baseline {reference})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Replay entry point; exits non-zero on errors or regressions"""
+    parser = argparse.ArgumentParser(description="Replay saved conversations against stubbed Confluence/DeepSeek")
+    parser.add_argument('corpus', nargs='+', help="conversation JSON/JSONL files or directories")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="conversations replayed concurrently")
+    parser.add_argument('--speed', type=float, default=60.0, help="time compression of recorded gaps (0 = no waiting)")
+    parser.add_argument('--confluence-latency-ms', type=float, default=50, help="simulated Confluence call latency")
+    parser.add_argument('--llm-latency-ms', type=float, default=300, help="simulated DeepSeek call latency")
+    parser.add_argument('--pages', help="JSON list of pages served by the Confluence stub")
+    parser.add_argument('--spaces', default=os.environ.get("CONFLUENCE_SPACES") or "DOCS",
+                        help="comma-separated space keys page titles are looked up in (default: CONFLUENCE_SPACES or DOCS)")
+    parser.add_argument('--baseline', help="baseline metrics JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    parser.add_argument('--save-baseline', help="write this run's metrics as the new baseline")
+    args = parser.parse_args(argv)
+
+    conversations = load_conversations(args.corpus)
+    if not conversations:
+        parser.error("no conversations found in the corpus")
+
+    os.environ["CONFLUENCE_SPACES"] = args.spaces
+    pages = None
+    if args.pages:
+        with open(args.pages) as f:
+            pages = json.load(f)
+
+    runner = ReplayRunner(workers=max(1, args.workers), speed=args.speed,
+                          confluence_latency_ms=args.confluence_latency_ms,
+                          llm_latency_ms=args.llm_latency_ms, pages=pages)
+    metrics = runner.run(conversations)
+
+    print(f"🔁 Replayed {metrics['turns']} turns from {metrics['conversations']} conversations "
+          f"in {metrics['elapsed_s']}s with {runner.workers} workers")
+    print(f"   latency p50 {metrics['latency_p50_ms']} ms, p95 {metrics['latency_p95_ms']} ms")
+    print(f"   cache hit rate {metrics['cache_hit_rate']:.1%}, "
+          f"{metrics['confluence_calls']} Confluence calls, {metrics['llm_calls']} LLM calls, "
+          f"prompt cache hit rate {metrics['prompt_cache_hit_rate']:.1%}")
+    for name, count in metrics['calls'].items():
+        print(f"      {name}: {count}")
+    for route, stats in metrics['llm_routes'].items():
+        print(f"   route {route}: {stats['calls']} calls, "
+              f"~{stats['avg_prompt_tokens']:.0f} prompt / {stats['avg_completion_tokens']:.0f} completion tokens")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(metrics, f, indent=2)
+        print(f"💾 Baseline saved to {args.save_baseline}")
+
+    ok = metrics['errors'] == 0
+    if metrics['errors']:
+        print(f"❌ {metrics['errors']} turns raised errors")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(metrics, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if not regressions:
+            print(f"✅ Within {args.tolerance:.0%} of baseline")
+        ok &= not regressions
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,20 @@
 import os
 import re
-from typing import Dict, Any
+import json
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
 from slack_bolt import App
 from slack_bolt.adapter.flask import SlackRequestHandler
 from flask import Flask, request
 from dotenv import load_dotenv
 from chatbot import ChatBot
+from page_snapshot import open_snapshot, write_snapshot
+from cache_invalidation import ConfluenceWebhookInvalidator
+from model_routing import model_router
+from rate_limiter import background_priority, confluence_limiter
+from title_index import title_catalog
 
 # Load environment variables
 load_dotenv()
@@ -22,8 +31,7 @@ class SlackChatBot:
         self.flask_app = Flask(__name__)
         self.handler = SlackRequestHandler(self.app)
         
-        # Store individual ChatBot instances per user
-        self.user_bots: Dict[str, ChatBot] = {}
+        self._init_state()
         
         # Set up event handlers
         self._setup_handlers()
@@ -31,6 +39,153 @@ class SlackChatBot:
         # Set up Flask routes
         self._setup_flask_routes()
     
+    def _init_state(self):
+        """Per-user bots, latency tracking and webhook invalidation (shared with the async variant)"""
+        # Store individual ChatBot instances per user
+        self.user_bots: Dict[str, ChatBot] = {}
+        self.user_locks: Dict[str, threading.Lock] = {}
+        self._user_bots_lock = threading.Lock()
+        
+        # Event-to-reply latency per transport ("http" or "socket")
+        self.transport = "http"
+        self.reply_latencies: Dict[str, deque] = {}
+        self.latency_log = os.environ.get("SLACK_LATENCY_LOG")
+        
+        # Confluence webhooks invalidate cached pages in the background
+        self.invalidator = ConfluenceWebhookInvalidator(
+            self.invalidate_confluence_page,
+            secret=os.environ.get("CONFLUENCE_WEBHOOK_SECRET"),
+            debounce_seconds=float(os.environ.get("CONFLUENCE_WEBHOOK_DEBOUNCE", 2.0))
+        )
+    
+    def _get_user_bot(self, user_id: str) -> ChatBot:
+        """Get or create the ChatBot instance for a user"""
+        with self._user_bots_lock:
+            if user_id not in self.user_bots:
+                self.user_bots[user_id] = ChatBot(f"SlackBot")
+                self.user_locks[user_id] = threading.Lock()
+            return self.user_bots[user_id]
+    
+    def _chat(self, user_id: str, text: str) -> str:
+        """Answer a user's message; messages from the same user are handled one at a time"""
+        user_bot = self._get_user_bot(user_id)
+        with self.user_locks[user_id]:
+            return user_bot.chat(text)
+    
+    def _record_latency(self, event_ts: Optional[str]):
+        """Record the time from Slack's event timestamp until our reply was sent"""
+        if not event_ts:
+            return
+        latency_ms = (time.time() - float(event_ts)) * 1000
+        self.reply_latencies.setdefault(self.transport, deque(maxlen=1000)).append(latency_ms)
+        if self.latency_log:
+            with open(self.latency_log, 'a') as f:
+                f.write(json.dumps({'transport': self.transport, 'latency_ms': round(latency_ms, 1)}) + "\n")
+    
+    def latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95 event-to-reply latency per transport, in milliseconds"""
+        summary = {}
+        for transport, latencies in self.reply_latencies.items():
+            ordered = sorted(latencies)
+            if ordered:
+                summary[transport] = {
+                    'count': len(ordered),
+                    'p50_ms': round(ordered[len(ordered) // 2], 1),
+                    'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1)
+                }
+        return summary
+    
+    def evict_confluence_page(self, page_id: str, page_exists: bool = True) -> List[ChatBot]:
+        """Drop a page from the snapshot, every user's cache and (if deleted) the title catalog
+        
+        Returns the bots that had the page cached.
+        """
+        snapshot_path = os.environ.get("CONFLUENCE_SNAPSHOT_PATH")
+        snapshot = open_snapshot(snapshot_path) if snapshot_path else None
+        if snapshot:
+            snapshot.mark_stale(page_id)
+        if not page_exists:
+            title_catalog.remove(page_id)
+        return [bot for bot in list(self.user_bots.values()) if bot.invalidate_page(page_id)]
+    
+    def invalidate_confluence_page(self, page_id: str, page_exists: bool = True):
+        """Invalidate a page in every user's cache; refresh it once if it still exists"""
+        holders = self.evict_confluence_page(page_id, page_exists)
+        if page_exists and holders:
+            with background_priority():
+                refreshed = holders[0].fetch_confluence_page_by_id(page_id)
+            if refreshed:
+                for bot in holders[1:]:
+                    bot.confluence_content_cache[f"id:{page_id}"] = refreshed
+        elif page_exists and page_id in title_catalog:
+            # Nobody has the page cached, but a rename or move must still reach the title catalog
+            self.refresh_catalog_title(page_id)
+    
+    def refresh_catalog_title(self, page_id: str):
+        """Re-read a page's title and space into the title catalog, in the background lane"""
+        bot = next(iter(list(self.user_bots.values())), None)
+        confluence = bot.confluence if bot else None
+        if not confluence:
+            return
+        try:
+            with background_priority():
+                page = confluence.get_page_by_id(page_id, expand='space')
+        except Exception as e:
+            print(f"Warning: Could not refresh the title of page {page_id}: {e}")
+            return
+        if page:
+            title_catalog.add(page_id, page['title'], page.get('space', {}).get('key', ''))
+    
+    def handle_confluence_webhook(self, body: bytes, signature: Optional[str], token: Optional[str],
+                                  event_key: Optional[str]) -> Tuple[Dict[str, Any], int]:
+        """Verify a Confluence webhook and queue the page for invalidation; returns (JSON body, status)"""
+        if not self.invalidator.verify(body, signature, token):
+            return {"status": "unauthorized"}, 401
+        
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            payload = {}
+        parsed = self.invalidator.parse(payload if isinstance(payload, dict) else {}, event_key)
+        if not parsed:
+            return {"status": "ignored"}, 200
+        
+        event, page_id = parsed
+        self.invalidator.submit(event, page_id)
+        return {"status": "accepted", "event": event, "page_id": page_id}, 202
+    
+    def home_view(self) -> Dict[str, Any]:
+        """App Home welcome view"""
+        return {
+            "type": "home",
+            "blocks": [
+                {
+                    "type": "header",
+                    "text": {
+                        "type": "plain_text",
+                        "text": "🤖 Welcome to SlackBot!"
+                    }
+                },
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": "*Hello!* I'm your friendly Slack chat bot. You can:\n\n• Send me direct messages\n• Mention me in channels with `@SlackBot`\n• Ask me questions, tell jokes, or just chat!\n\nI can recognize greetings, answer questions about time, tell jokes, and much more. Try saying hello!"
+                    }
+                },
+                {
+                    "type": "divider"
+                },
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": "*Quick Examples:*\n• `Hello!`\n• `Tell me a joke`\n• `What time is it?`\n• `My name is [Your Name]`"
+                    }
+                }
+            ]
+        }
+    
     def _setup_handlers(self):
         """Set up Slack event handlers"""
         
@@ -40,17 +195,12 @@ class SlackChatBot:
             user_id = message['user']
             text = message['text']
             
-            # Get or create a ChatBot instance for this user
-            if user_id not in self.user_bots:
-                self.user_bots[user_id] = ChatBot(f"SlackBot")
-            
-            user_bot = self.user_bots[user_id]
-            
-            # Generate response using the chatbot
-            response = user_bot.chat(text)
+            # Generate response using this user's chatbot
+            response = self._chat(user_id, text)
             
             # Send response back to Slack
             say(response)
+            self._record_latency(message.get('ts'))
         
         # Handle app mentions (@botname)
         @self.app.event("app_mention")
@@ -61,17 +211,12 @@ class SlackChatBot:
             # Remove the bot mention from the text
             text = re.sub(r'<@\w+>', '', text).strip()
             
-            # Get or create a ChatBot instance for this user
-            if user_id not in self.user_bots:
-                self.user_bots[user_id] = ChatBot(f"SlackBot")
-            
-            user_bot = self.user_bots[user_id]
-            
             # Generate response
-            response = user_bot.chat(text)
+            response = self._chat(user_id, text)
             
             # Send response back to the channel
             say(response)
+            self._record_latency(event.get('ts'))
         
         # Handle the app_home_opened event
         @self.app.event("app_home_opened")
@@ -80,38 +225,7 @@ class SlackChatBot:
             
             # Create welcome message for App Home
             try:
-                client.views_publish(
-                    user_id=user_id,
-                    view={
-                        "type": "home",
-                        "blocks": [
-                            {
-                                "type": "header",
-                                "text": {
-                                    "type": "plain_text",
-                                    "text": "🤖 Welcome to SlackBot!"
-                                }
-                            },
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": "*Hello!* I'm your friendly Slack chat bot. You can:\n\n• Send me direct messages\n• Mention me in channels with `@SlackBot`\n• Ask me questions, tell jokes, or just chat!\n\nI can recognize greetings, answer questions about time, tell jokes, and much more. Try saying hello!"
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": "*Quick Examples:*\n• `Hello!`\n• `Tell me a joke`\n• `What time is it?`\n• `My name is [Your Name]`"
-                                }
-                            }
-                        ]
-                    }
-                )
+                client.views_publish(user_id=user_id, view=self.home_view())
             except Exception as e:
                 print(f"Error publishing home view: {e}")
         
@@ -122,14 +236,8 @@ class SlackChatBot:
             user_id = command['user_id']
             text = command['text']
             
-            # Get or create a ChatBot instance for this user
-            if user_id not in self.user_bots:
-                self.user_bots[user_id] = ChatBot(f"SlackBot")
-            
-            user_bot = self.user_bots[user_id]
-            
             # Generate response
-            response = user_bot.chat(text)
+            response = self._chat(user_id, text)
             
             respond(f"🤖 {response}")
     
@@ -142,7 +250,23 @@ class SlackChatBot:
         
         @self.flask_app.route("/health", methods=["GET"])
         def health_check():
-            return {"status": "healthy", "bot": "SlackBot is running!"}, 200
+            return {
+                "status": "healthy",
+                "bot": "SlackBot is running!",
+                "transport": self.transport,
+                "reply_latency": self.latency_summary(),
+                "confluence_limiter": confluence_limiter.status(),
+                "model_routes": model_router.summary()
+            }, 200
+        
+        @self.flask_app.route("/confluence/webhook", methods=["POST"])
+        def confluence_webhook():
+            return self.handle_confluence_webhook(
+                request.get_data(),
+                request.headers.get("X-Hub-Signature"),
+                request.args.get("token"),
+                request.headers.get("X-Event-Key")
+            )
         
         @self.flask_app.route("/", methods=["GET"])
         def home():
@@ -150,22 +274,92 @@ class SlackChatBot:
                 "message": "SlackBot is running!",
                 "endpoints": {
                     "events": "/slack/events",
-                    "health": "/health"
+                    "health": "/health",
+                    "confluence_webhook": "/confluence/webhook"
                 }
             }, 200
     
+    def save_snapshot(self) -> Optional[str]:
+        """Write the pages cached by all users to the page snapshot for warm restarts"""
+        path = os.environ.get("CONFLUENCE_SNAPSHOT_PATH")
+        if not path:
+            return None
+        
+        pages = [item for bot in list(self.user_bots.values()) for item in bot.confluence_content_cache.items()]
+        snapshot = open_snapshot(path)
+        if snapshot:
+            pages.extend(snapshot.items())
+        if not pages:
+            return None
+        
+        write_snapshot(path, pages)
+        return path
+    
     def run(self, host="0.0.0.0", port=3000, debug=False):
         """Run the Flask app"""
         print(f"🤖 SlackBot is starting on {host}:{port}")
         print(f"📡 Webhook URL: http://{host}:{port}/slack/events")
         print(f"❤️  Health check: http://{host}:{port}/health")
         
-        self.flask_app.run(host=host, port=port, debug=debug)
+        try:
+            self.flask_app.run(host=host, port=port, debug=debug)
+        finally:
+            self._shutdown()
+    
+    def run_socket_mode(self, connections: int = 1, concurrency: int = 10, host="0.0.0.0", port=3000):
+        """Run over Socket Mode: persistent WebSocket connections instead of inbound webhooks
+        
+        Each connection is a SocketModeHandler sharing the same Bolt app and handlers;
+        Slack spreads events across up to 10 open connections per app, and each one
+        reconnects automatically. The Flask app keeps serving /health on host:port.
+        """
+        from slack_bolt.adapter.socket_mode import SocketModeHandler
+        
+        self.transport = "socket"
+        connections = max(1, min(connections, 10))
+        print(f"🤖 SlackBot is starting in Socket Mode with {connections} connection(s)")
+        
+        handlers = [
+            SocketModeHandler(
+                self.app,
+                os.environ.get("SLACK_APP_TOKEN"),
+                auto_reconnect_enabled=True,
+                concurrency=concurrency
+            )
+            for _ in range(connections)
+        ]
+        
+        health_server = threading.Thread(
+            target=self.flask_app.run,
+            kwargs={"host": host, "port": port},
+            daemon=True
+        )
+        health_server.start()
+        print(f"❤️  Health check: http://{host}:{port}/health")
+        
+        try:
+            for handler in handlers:
+                handler.connect()
+            threading.Event().wait()
+        finally:
+            for handler in handlers:
+                handler.close()
+            self._shutdown()
+    
+    def _shutdown(self):
+        """Persist warm data and report reply latency on exit"""
+        snapshot_path = self.save_snapshot()
+        if snapshot_path:
+            print(f"💾 Page snapshot saved to {snapshot_path}")
+        
+        for transport, stats in self.latency_summary().items():
+            print(f"📈 {transport} event-to-reply latency: p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms over {stats['count']} replies")
 
 def main():
     """Main entry point"""
     # Check for required environment variables
-    required_vars = ["SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET"]
+    transport = os.environ.get("SLACK_TRANSPORT", "http").lower()
+    required_vars = ["SLACK_BOT_TOKEN", "SLACK_APP_TOKEN"] if transport == "socket" else ["SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET"]
     missing_vars = [var for var in required_vars if not os.environ.get(var)]
     
     if missing_vars:
@@ -183,7 +377,15 @@ def main():
     host = os.environ.get("HOST", "0.0.0.0")
     debug = os.environ.get("DEBUG", "false").lower() == "true"
     
-    slack_bot.run(host=host, port=port, debug=debug)
+    if transport == "socket":
+        slack_bot.run_socket_mode(
+            connections=int(os.environ.get("SLACK_SOCKET_CONNECTIONS", 1)),
+            concurrency=int(os.environ.get("SLACK_SOCKET_CONCURRENCY", 10)),
+            host=host,
+            port=port
+        )
+    else:
+        slack_bot.run(host=host, port=port, debug=debug)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -6,19 +6,17 @@ Choose between CLI chatbot or Slack bot
 
 import sys
 import os
+import importlib.util
 from pathlib import Path
 
 def check_requirements():
-    """Check if requirements are installed"""
-    try:
-        import slack_bolt
-        import flask
-        import dotenv
-        return True
-    except ImportError as e:
-        print(f"❌ Missing dependencies: {e}")
+    """Check if requirements are installed (without importing them)"""
+    missing = [name for name in ("slack_bolt", "flask", "dotenv") if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"❌ Missing dependencies: {', '.join(missing)}")
         print("Install with: pip install -r requirements.txt")
         return False
+    return True
 
 def check_env_file():
     """Check if .env file exists for Slack bot"""
@@ -31,7 +29,10 @@ def check_env_file():
     from dotenv import load_dotenv
     load_dotenv()
     
-    required_vars = ["SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET"]
+    if os.environ.get("SLACK_TRANSPORT", "http").lower() == "socket":
+        required_vars = ["SLACK_BOT_TOKEN", "SLACK_APP_TOKEN"]
+    else:
+        required_vars = ["SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET"]
     missing_vars = [var for var in required_vars if not os.environ.get(var) or os.environ.get(var) == f"your-{var.lower().replace('_', '-')}-here"]
     
     if missing_vars:
@@ -0,0 +1,103 @@
+"""Tests for ConfluenceWebhookInvalidator verification, debouncing and max_wait"""
+
+import hashlib
+import hmac
+import threading
+import time
+
+from cache_invalidation import ConfluenceWebhookInvalidator
+
+
+class Recorder:
+    """Collects on_invalidate calls with the time they were made"""
+
+    def __init__(self):
+        self.calls = []
+        self.called = threading.Event()
+
+    def __call__(self, page_id: str, page_exists: bool):
+        self.calls.append((page_id, page_exists, time.monotonic()))
+        self.called.set()
+
+
+def test_a_burst_of_events_for_one_page_invalidates_it_once():
+    recorder = Recorder()
+    invalidator = ConfluenceWebhookInvalidator(recorder, debounce_seconds=0.1, max_wait_seconds=5)
+    for _ in range(5):
+        invalidator.submit('page_updated', "42")
+        time.sleep(0.02)
+
+    assert recorder.called.wait(2)
+    time.sleep(0.2)
+    assert [call[:2] for call in recorder.calls] == [("42", True)]
+
+
+def test_the_last_event_decides_whether_the_page_still_exists():
+    recorder = Recorder()
+    invalidator = ConfluenceWebhookInvalidator(recorder, debounce_seconds=0.05)
+    invalidator.submit('page_updated', "42")
+    invalidator.submit('page_trashed', "42")
+    invalidator.submit('page_moved', "7")
+
+    assert recorder.called.wait(2)
+    time.sleep(0.1)
+    assert sorted(call[:2] for call in recorder.calls) == [("42", False), ("7", True)]
+
+
+def test_a_steady_stream_still_flushes_within_max_wait():
+    recorder = Recorder()
+    invalidator = ConfluenceWebhookInvalidator(recorder, debounce_seconds=0.1, max_wait_seconds=0.3)
+    started = time.monotonic()
+    while time.monotonic() - started < 1.0:
+        invalidator.submit('page_updated', "42")
+        time.sleep(0.03)
+
+    assert recorder.calls
+    # The first flush comes at most max_wait + debounce after the first event
+    assert recorder.calls[0][2] - started < 0.3 + 0.1 + 0.1
+    assert len(recorder.calls) >= 2
+
+
+def test_a_failing_callback_does_not_stop_the_other_pages():
+    seen = []
+
+    def on_invalidate(page_id, page_exists):
+        seen.append(page_id)
+        if page_id == "1":
+            raise RuntimeError("Confluence is down")
+
+    invalidator = ConfluenceWebhookInvalidator(on_invalidate, debounce_seconds=60)
+    invalidator.submit('page_updated', "1")
+    invalidator.submit('page_updated', "2")
+    invalidator.flush()
+    assert seen == ["1", "2"]
+    assert invalidator._timer is None
+
+
+def test_verify_signature_and_token():
+    invalidator = ConfluenceWebhookInvalidator(lambda *args: None, secret="s3cret")
+    body = b'{"event": "page_updated"}'
+    signature = "sha256=" + hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+
+    assert invalidator.verify(body, signature=signature)
+    assert not invalidator.verify(body + b" ", signature=signature)
+    assert invalidator.verify(body, token="s3cret")
+    assert not invalidator.verify(body, token="wrong")
+    assert not invalidator.verify(body)
+    # Non-ASCII headers are rejected rather than raising
+    assert not invalidator.verify(body, signature="sha256=é\udce9")
+    assert not invalidator.verify(body, token="s3crét")
+
+
+def test_verify_rejects_everything_without_a_secret():
+    invalidator = ConfluenceWebhookInvalidator(lambda *args: None)
+    assert not invalidator.verify(b"{}", token="")
+    assert not invalidator.verify(b"{}", signature="sha256=00")
+
+
+def test_parse_accepts_page_events_only():
+    invalidator = ConfluenceWebhookInvalidator(lambda *args: None)
+    assert invalidator.parse({'event': 'page_updated', 'page': {'id': 123}}) == ('page_updated', "123")
+    assert invalidator.parse({'page': {'id': 5}}, event='page_removed') == ('page_removed', "5")
+    assert invalidator.parse({'event': 'comment_created', 'page': {'id': 5}}) is None
+    assert invalidator.parse({'event': 'page_updated', 'page': {}}) is None
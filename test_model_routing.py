@@ -0,0 +1,78 @@
+"""Tests for model routing policy files and route selection"""
+
+import json
+import math
+
+from model_routing import DEFAULT_POLICIES, ModelRouter, load_policies
+
+
+def write_policy(tmp_path, data) -> str:
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+def test_no_policy_file_uses_the_defaults():
+    assert load_policies(None) == DEFAULT_POLICIES
+    assert load_policies("") == DEFAULT_POLICIES
+
+
+def test_overrides_update_existing_routes_and_add_new_ones(tmp_path):
+    policies = load_policies(write_policy(tmp_path, {
+        "complex": {"model": "deepseek-reasoner", "max_tokens": 2000, "name": "ignored", "unknown": 1},
+        "huge": {"max_score": None, "timeout": 120},
+    }))
+    assert policies["complex"] == DEFAULT_POLICIES["complex"]._replace(model="deepseek-reasoner", max_tokens=2000)
+    assert policies["huge"].name == "huge"
+    assert policies["huge"].max_score == math.inf
+    assert policies["huge"].model == DEFAULT_POLICIES["standard"].model
+    assert policies["lookup"] == DEFAULT_POLICIES["lookup"]
+
+
+def test_routes_that_are_not_objects_are_skipped(tmp_path, capsys):
+    policies = load_policies(write_policy(tmp_path, {
+        "complex": "deepseek-reasoner",
+        "lookup": {"max_tokens": 100},
+    }))
+    assert policies["complex"] == DEFAULT_POLICIES["complex"]
+    assert policies["lookup"].max_tokens == 100
+    assert "Skipping model routing route 'complex'" in capsys.readouterr().out
+
+
+def test_a_policy_file_that_is_not_an_object_falls_back_to_the_defaults(tmp_path, capsys):
+    assert load_policies(write_policy(tmp_path, ["complex"])) == DEFAULT_POLICIES
+    assert "must be a JSON object" in capsys.readouterr().out
+
+
+def test_unreadable_policy_files_fall_back_to_the_defaults(tmp_path):
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json")
+    assert load_policies(str(broken)) == DEFAULT_POLICIES
+    assert load_policies(str(tmp_path / "missing.json")) == DEFAULT_POLICIES
+
+
+def test_routes_follow_the_complexity_score():
+    router = ModelRouter()
+    assert router.choose("What is the VPN address?").name == "lookup"
+    assert router.choose("Why do we deploy on Tuesdays?").name == "standard"
+    assert router.choose("Explain how the deployment pipeline works and compare it with rollbacks",
+                         context="x" * 7000).name == "complex"
+
+
+def test_disabled_routing_always_uses_the_standard_route():
+    router = ModelRouter(enabled=False)
+    assert router.choose("Explain and compare every step", context="x" * 7000).name == "standard"
+
+
+def test_summary_reports_calls_truncation_and_cache_hits():
+    class Usage:
+        prompt_tokens = 1000
+        completion_tokens = 250
+        prompt_cache_hit_tokens = 800
+
+    router = ModelRouter()
+    router.record(DEFAULT_POLICIES["lookup"], 0.2, Usage())
+    router.record(DEFAULT_POLICIES["lookup"], 0.4, error=True)
+    summary = router.summary()["lookup"]
+    assert (summary["calls"], summary["errors"], summary["truncated"]) == (2, 1, 1)
+    assert summary["cache_hit_rate"] == 0.8
@@ -0,0 +1,88 @@
+"""Tests for PageStore alias keys and rename handling"""
+
+from page_store import PageStore
+
+
+def page(page_id: str, title: str, space_key: str = "DEV", content: str = "body", version: int = 1):
+    return {'id': page_id, 'title': title, 'space_key': space_key, 'content': content,
+            'url': f"https://wiki/{page_id}", 'version': version}
+
+
+def test_page_is_reachable_by_every_alias():
+    store = PageStore()
+    store["DEV:Deploy Guide"] = page("1", "Deploy Guide")
+
+    assert store["id:1"] is store["DEV:Deploy Guide"]
+    assert store.find("1").title == "Deploy Guide"
+    assert store.find("  deploy   GUIDE ").id == "1"
+    assert store.find("DEV: deploy guide").id == "1"
+    assert len(store) == 1
+    assert store.titles() == ["Deploy Guide"]
+
+
+def test_rename_drops_the_old_title_and_alias():
+    store = PageStore()
+    store["DEV:Old Name"] = page("1", "Old Name")
+    store["id:1"] = page("1", "New Name", version=2)
+
+    assert store.find("Old Name") is None
+    assert "DEV:Old Name" not in store
+    assert store.find("New Name").version == 2
+    assert store["DEV:New Name"] is store["id:1"]
+    assert len(store) == 1
+
+
+def test_move_to_another_space_updates_the_space_alias():
+    store = PageStore()
+    store["DEV:Runbook"] = page("1", "Runbook")
+    store["id:1"] = page("1", "Runbook", space_key="OPS", version=2)
+
+    assert "DEV:Runbook" not in store
+    assert store.find("OPS:Runbook").space_key == "OPS"
+    assert store.find("DEV:Runbook") is None
+
+
+def test_alias_taken_over_by_another_page():
+    store = PageStore()
+    store["DEV:Runbook"] = page("1", "Runbook")
+    store["id:1"] = page("1", "Runbook (archived)", version=2)
+    store["DEV:Runbook"] = page("2", "Runbook")
+
+    assert store["DEV:Runbook"].id == "2"
+    assert store.find("Runbook (archived)").id == "1"
+
+    store.evict("1")
+    assert store["DEV:Runbook"].id == "2"
+    assert "id:1" not in store
+    assert sorted(store.keys()) == ["DEV:Runbook", "id:2"]
+
+
+def test_evict_removes_every_alias_and_title():
+    store = PageStore()
+    store["custom-key"] = page("1", "Deploy Guide")
+
+    assert store.evict("1").id == "1"
+    assert store.keys() == []
+    assert store.find("Deploy Guide") is None
+    assert store.evict("1") is None
+
+
+def test_same_title_in_two_spaces_prefers_the_requested_space():
+    store = PageStore()
+    store["DEV:Runbook"] = page("1", "Runbook")
+    store["OPS:Runbook"] = page("2", "Runbook", space_key="OPS")
+
+    assert store.find("DEV:Runbook").id == "1"
+    assert store.find("OPS:runbook").id == "2"
+    assert store.find("Runbook").id == "2"  # the most recently stored page wins
+
+
+def test_max_pages_evicts_the_least_recently_used_page():
+    store = PageStore(max_pages=2)
+    store["a"] = page("1", "One")
+    store["b"] = page("2", "Two")
+    store.find("One")
+    store["c"] = page("3", "Three")
+
+    assert [record.id for record in store.values()] == ["1", "3"]
+    assert "b" not in store and "id:2" not in store
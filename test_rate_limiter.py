@@ -0,0 +1,142 @@
+"""Tests for AdaptiveLimiter lanes, the background reserve and Retry-After handling"""
+
+import threading
+import time
+from email.utils import formatdate
+
+from rate_limiter import BACKGROUND, INTERACTIVE, AdaptiveLimiter, LimitedHTTPAdapter, retry_after_seconds
+
+
+class Waiter:
+    """Records the order in which queued requests are granted a slot"""
+
+    def __init__(self, granted: list, name: str):
+        self.event = threading.Event()
+        self.granted = granted
+        self.name = name
+
+    def __call__(self):
+        self.granted.append(self.name)
+        self.event.set()
+
+
+def test_min_limit_keeps_a_slot_above_the_reserve():
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, reserve=1)
+    assert limiter.min_limit == 2
+    assert limiter.limit == 2
+
+
+def test_background_work_never_takes_the_reserved_slots():
+    limiter = AdaptiveLimiter(initial=3, reserve=1)
+    granted = []
+
+    assert limiter._enqueue(BACKGROUND, Waiter(granted, "bg1"))
+    assert limiter._enqueue(BACKGROUND, Waiter(granted, "bg2"))
+    assert not limiter._enqueue(BACKGROUND, Waiter(granted, "bg3"))
+    # The last slot is still free for a user who is waiting, even with background work queued
+    assert not limiter._enqueue(INTERACTIVE, Waiter(granted, "user"))
+    assert granted == ["user"]
+    assert limiter.in_flight == 3
+
+    limiter.release()  # the user's request finishes; bg3 still may not take the reserved slot
+    assert granted == ["user"]
+    limiter.release()  # one background request finishes
+    assert granted == ["user", "bg3"]
+
+
+def test_interactive_requests_are_granted_before_queued_background_ones():
+    limiter = AdaptiveLimiter(initial=2, reserve=1)
+    granted = []
+    assert limiter._enqueue(INTERACTIVE, Waiter(granted, "first"))
+    assert limiter._enqueue(INTERACTIVE, Waiter(granted, "second"))
+    limiter._enqueue(BACKGROUND, Waiter(granted, "bg"))
+    limiter._enqueue(INTERACTIVE, Waiter(granted, "user"))
+
+    limiter.release()
+    assert granted == ["user"]
+    limiter.release()  # one slot is free, but it is the reserved one
+    assert granted == ["user"]
+    limiter.release()
+    assert granted == ["user", "bg"]
+
+
+def test_throttling_halves_the_limit_once_per_cooldown():
+    limiter = AdaptiveLimiter(initial=16, cooldown=60)
+    for _ in range(5):
+        limiter.on_response(429, {})
+    assert limiter.limit == 8
+    assert limiter.stats['throttled'] == 5
+    assert limiter.stats['decreases'] == 1
+
+
+def test_healthy_responses_grow_the_limit_unless_near_the_server_limit():
+    limiter = AdaptiveLimiter(initial=4, max_limit=5)
+    for _ in range(4):
+        limiter.on_response(200, {})
+    assert limiter.limit > 4.9
+
+    held = limiter.limit
+    limiter.on_response(200, {'X-RateLimit-NearLimit': 'true'})
+    limiter.on_response(200, {'X-RateLimit-Remaining': '1'})
+    assert limiter.limit == held
+
+    for _ in range(10):
+        limiter.on_response(200, {})
+    assert limiter.limit == 5
+
+
+def test_retry_after_pauses_new_requests_until_it_has_passed():
+    limiter = AdaptiveLimiter(initial=8)
+    limiter.on_response(429, {'Retry-After': '0.2'})
+    granted = []
+    waiter = Waiter(granted, "user")
+
+    started = time.monotonic()
+    assert not limiter._enqueue(INTERACTIVE, waiter)
+    assert waiter.event.wait(2)
+    assert time.monotonic() - started >= 0.15
+    assert limiter.in_flight == 1
+
+
+def test_retry_after_header_formats():
+    assert retry_after_seconds({'Retry-After': '3'}) == 3
+    assert retry_after_seconds({'Retry-After': '-1'}) == 0
+    assert retry_after_seconds({}, default=2.5) == 2.5
+    assert retry_after_seconds({'Retry-After': 'soon'}, default=1.5) == 1.5
+    assert 8 < retry_after_seconds({'Retry-After': formatdate(time.time() + 10, usegmt=True)}) <= 10
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: dict):
+        self.status_code = status_code
+        self.headers = headers
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAdapter:
+    """Returns the queued statuses in order"""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        return FakeResponse(self.statuses.pop(0), {'Retry-After': '0'})
+
+
+def test_adapter_retries_throttled_requests():
+    adapter = LimitedHTTPAdapter(FakeAdapter([429, 503, 200]), AdaptiveLimiter(), max_retries=3)
+    assert adapter.send(None).status_code == 200
+    assert adapter.adapter.sent == 3
+    assert adapter.limiter.in_flight == 0
+
+
+def test_adapter_returns_the_last_throttled_response_after_max_retries():
+    adapter = LimitedHTTPAdapter(FakeAdapter([429] * 3), AdaptiveLimiter(), max_retries=2)
+    response = adapter.send(None)
+    assert response.status_code == 429 and not response.closed
+    assert adapter.adapter.sent == 3
@@ -0,0 +1,101 @@
+"""Tests for TitleCatalog reference resolution and space listing"""
+
+import time
+
+from title_index import TitleCatalog
+
+
+def catalog_with(*pages) -> TitleCatalog:
+    catalog = TitleCatalog()
+    for page_id, title, space_key in pages:
+        catalog.add(page_id, title, space_key)
+    return catalog
+
+
+def test_exact_titles_resolve_case_and_whitespace_insensitively():
+    catalog = catalog_with(("1", "Deployment Guide", "DEV"))
+    match = catalog.resolve("  deployment   GUIDE ")
+    assert (match.page_id, match.title, match.space_key, match.score) == ("1", "Deployment Guide", "DEV", 1.0)
+
+
+def test_an_unambiguous_prefix_resolves():
+    catalog = catalog_with(("1", "Deployment Guide", "DEV"), ("2", "Onboarding", "DEV"))
+    assert catalog.resolve("deployment").page_id == "1"
+
+
+def test_a_prefix_below_the_threshold_does_not_resolve():
+    catalog = catalog_with(("1", "Deployment Guide", "DEV"))
+    assert catalog.resolve("dep") is None
+    assert catalog.resolve("dep", threshold=0.7).page_id == "1"
+
+
+def test_a_prefix_of_several_titles_is_ambiguous():
+    catalog = catalog_with(("1", "Deployment Guide", "DEV"), ("2", "Deployment Checklist", "OPS"))
+    assert catalog.resolve("deployment") is None
+    assert {match.page_id for match in catalog.suggest("deployment")} == {"1", "2"}
+    # Restricting the spaces removes the ambiguity
+    assert catalog.resolve("deployment", space_keys=["OPS"]).page_id == "2"
+
+
+def test_an_exact_title_wins_over_longer_titles_it_prefixes():
+    catalog = catalog_with(("50", "Page 50", "DEV"), ("500", "Page 500", "DEV"))
+    assert catalog.resolve("page 50").page_id == "50"
+    assert catalog.resolve("page 500").page_id == "500"
+    assert catalog.resolve("page 5") is None
+
+
+def test_fuzzy_matches_are_suggested_but_never_resolved():
+    catalog = catalog_with(("1", "Deployment Guide", "DEV"), ("2", "Incident Runbook", "OPS"))
+    assert catalog.resolve("deploymnet guide") is None
+    assert catalog.suggest("deploymnet guide")[0].page_id == "1"
+    assert catalog.suggest("quarterly budget") == []
+
+
+def test_renamed_and_removed_pages_update_the_indexes():
+    catalog = catalog_with(("1", "Old Name", "DEV"))
+    catalog.add("1", "New Name", "DEV")
+    assert catalog.resolve("old name") is None
+    assert catalog.resolve("new name").page_id == "1"
+    assert len(catalog) == 1
+
+    catalog.remove("1")
+    assert catalog.resolve("new name") is None
+    assert "1" not in catalog
+    assert catalog.search("new name") == []
+
+
+class FakeConfluence:
+    """Lists a space in batches of at most `page_size` pages, like a server that caps `limit`"""
+
+    def __init__(self, spaces, page_size: int = 2):
+        self.spaces = spaces
+        self.page_size = page_size
+        self.calls = 0
+
+    def get_all_pages_from_space(self, space_key, start=0, limit=500):
+        self.calls += 1
+        pages = self.spaces[space_key]
+        return pages[start:start + min(limit, self.page_size)]
+
+
+def test_sync_space_pages_through_capped_listings_and_drops_vanished_pages():
+    catalog = catalog_with(("9", "Deleted Page", "DEV"), ("7", "Other Space", "OPS"))
+    confluence = FakeConfluence({'DEV': [{'id': str(i), 'title': f"Page {i}"} for i in range(5)]})
+
+    assert catalog.sync_space(confluence, "DEV")
+    assert confluence.calls == 4  # three batches plus the empty one that ends the listing
+    assert len(catalog) == 6
+    assert "9" not in catalog and "7" in catalog
+    assert catalog.resolve("page 4").page_id == "4"
+
+
+def test_ensure_synced_lists_in_the_background_and_reports_completeness():
+    catalog = TitleCatalog()
+    confluence = FakeConfluence({'DEV': [{'id': "1", 'title': "Runbook"}]})
+
+    assert not catalog.ensure_synced(confluence, ["DEV"])
+    deadline = time.monotonic() + 2
+    while not catalog.ensure_synced(confluence, ["DEV"]) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert catalog.resolve("runbook").page_id == "1"
+    assert confluence.calls == 2
@@ -0,0 +1,235 @@
+"""
+Local catalog of Confluence page titles for resolving loose page references.
+
+`TitleCatalog` lists every page title of the configured spaces once (one
+paginated call per space) and keeps them in memory with two indexes:
+
+- a sorted list of normalized titles, searched with `bisect` for exact and
+  prefix matches ("deployment" -> "Deployment Guide")
+- a trigram index for fuzzy matches that tolerate typos and word order
+  ("deploymnet guide" -> "Deployment Guide")
+
+A reference that is an exact title, or an unambiguous prefix of one, then
+resolves to a page id locally instead of trying `get_page_by_title` in every
+space. Fuzzy matches are only offered as "did you mean" suggestions, and
+references the catalog does not know (e.g. pages created since the last
+listing) still fall back to `get_page_by_title`.
+
+Spaces are listed in the background lane, first when a bot starts and again
+every `refresh_seconds`; until a space has been listed, references fall back to
+`get_page_by_title` too. Fetched, renamed and removed pages update the catalog
+immediately.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from page_store import normalize_title
+from rate_limiter import background_priority
+
+PAGE_LIST_LIMIT = 500
+FUZZY_CANDIDATES = 20
+
+
+class TitleMatch(NamedTuple):
+    page_id: str
+    title: str
+    space_key: str
+    score: float  # 1.0 for exact matches
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleCatalog:
+    """Process-wide title -> page id index for a set of Confluence spaces"""
+
+    def __init__(self, refresh_seconds: float = 900):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Tuple[str, str, str]] = {}  # page id -> (title, space key, normalized title)
+        self._sorted: List[Tuple[str, str]] = []  # (normalized title, page id)
+        self._trigrams: Dict[str, Set[str]] = {}  # trigram -> page ids
+        self._synced_at: Dict[str, float] = {}  # space key -> time of last full listing
+        self._syncing: Set[str] = set()
+
+    def add(self, page_id: str, title: str, space_key: str):
+        """Add or update one page"""
+        page_id = str(page_id)
+        normalized = normalize_title(title)
+        with self._lock:
+            existing = self._entries.get(page_id)
+            if existing == (title, space_key, normalized):
+                return
+            if existing is not None:
+                self._unindex(page_id, existing[2])
+            self._entries[page_id] = (title, space_key, normalized)
+            insort(self._sorted, (normalized, page_id))
+            for gram in trigrams(normalized):
+                self._trigrams.setdefault(gram, set()).add(page_id)
+
+    def remove(self, page_id: str):
+        """Drop a page that was deleted or trashed"""
+        with self._lock:
+            existing = self._entries.pop(str(page_id), None)
+            if existing is not None:
+                self._unindex(str(page_id), existing[2])
+
+    def _unindex(self, page_id: str, normalized: str):
+        position = bisect_left(self._sorted, (normalized, page_id))
+        if position < len(self._sorted) and self._sorted[position] == (normalized, page_id):
+            del self._sorted[position]
+        for gram in trigrams(normalized):
+            page_ids = self._trigrams.get(gram)
+            if page_ids is not None:
+                page_ids.discard(page_id)
+                if not page_ids:
+                    del self._trigrams[gram]
+
+    def sync_space(self, confluence, space_key: str) -> bool:
+        """List every page title of a space and replace that space's entries"""
+        titles = {}
+        start = 0
+        try:
+            while True:
+                pages = confluence.get_all_pages_from_space(space_key, start=start, limit=PAGE_LIST_LIMIT) or []
+                # The server may cap the page size below PAGE_LIST_LIMIT, so only an empty batch ends the listing
+                if not pages:
+                    break
+                for page in pages:
+                    titles[str(page['id'])] = page['title']
+                start += len(pages)
+        except Exception as e:
+            print(f"Warning: Could not list pages of space {space_key}: {e}")
+            return False
+
+        with self._lock:
+            for page_id in [page_id for page_id, entry in self._entries.items()
+                            if entry[1] == space_key and page_id not in titles]:
+                self.remove(page_id)
+            for page_id, title in titles.items():
+                self.add(page_id, title, space_key)
+            self._synced_at[space_key] = time.monotonic()
+        return True
+
+    def ensure_synced(self, confluence, space_keys: Iterable[str]) -> bool:
+        """List never-listed and stale spaces in the background lane; never waits for a listing
+
+        Returns False while a space has not been listed yet, i.e. the catalog is incomplete
+        and callers should fall back to per-space title lookups.
+        """
+        complete = True
+        for space_key in space_keys:
+            with self._lock:
+                synced_at = self._synced_at.get(space_key)
+                complete = complete and synced_at is not None
+                if synced_at is not None and time.monotonic() - synced_at < self.refresh_seconds:
+                    continue
+                if space_key in self._syncing:
+                    continue
+                self._syncing.add(space_key)
+            threading.Thread(target=self._background_sync, args=(confluence, space_key),
+                             name="title-sync", daemon=True).start()
+        return complete
+
+    def _background_sync(self, confluence, space_key: str):
+        try:
+            with background_priority():
+                self.sync_space(confluence, space_key)
+        finally:
+            with self._lock:
+                self._syncing.discard(space_key)
+
+    def _match(self, page_id: str, score: float) -> TitleMatch:
+        title, space_key, _ = self._entries[page_id]
+        return TitleMatch(page_id, title, space_key, score)
+
+    def _prefix_matches(self, normalized: str, spaces: Optional[Set[str]], limit: int) -> List[TitleMatch]:
+        """Exact and prefix matches, which are contiguous in the sorted titles (caller holds the lock)"""
+        matches = []
+        position = bisect_left(self._sorted, (normalized, ''))
+        while position < len(self._sorted) and len(matches) < limit:
+            title, page_id = self._sorted[position]
+            if not title.startswith(normalized):
+                break
+            if spaces is None or self._entries[page_id][1] in spaces:
+                score = 1.0 if title == normalized else 0.7 + 0.3 * len(normalized) / len(title)
+                matches.append(self._match(page_id, score))
+            position += 1
+        return matches
+
+    def search(self, reference: str, space_keys: Optional[Iterable[str]] = None, limit: int = 5) -> List[TitleMatch]:
+        """Best title matches for a reference: exact, then prefix, then fuzzy"""
+        normalized = normalize_title(reference)
+        if not normalized:
+            return []
+        spaces = set(space_keys) if space_keys else None
+
+        with self._lock:
+            matches = {match.page_id: match for match in self._prefix_matches(normalized, spaces, limit)}
+
+            # Fuzzy matches: titles sharing the most trigrams, ranked by trigram overlap,
+            # with edit similarity computed only for the few best candidates
+            if len(matches) < limit:
+                # Count only the rarer half of the reference's trigrams: common ones match
+                # thousands of titles without telling them apart. Trigrams no title has
+                # (typically the typo itself) are skipped rather than counted as rarest.
+                grams = trigrams(normalized)
+                postings = sorted((self._trigrams[gram] for gram in grams if gram in self._trigrams), key=len)
+                shared = Counter()
+                for page_ids in postings[:max(3, len(postings) // 2)]:
+                    shared.update(page_ids)
+
+                candidates = []
+                for page_id, _ in shared.most_common(FUZZY_CANDIDATES):
+                    title, space_key, title_normalized = self._entries[page_id]
+                    if page_id in matches or (spaces is not None and space_key not in spaces):
+                        continue
+                    title_grams = trigrams(title_normalized)
+                    overlap = 2 * len(grams & title_grams) / (len(grams) + len(title_grams))
+                    candidates.append((overlap, page_id))
+
+                from difflib import SequenceMatcher  # only fuzzy lookups need it
+
+                for _, page_id in sorted(candidates, reverse=True)[:limit + 2]:
+                    score = SequenceMatcher(None, normalized, self._entries[page_id][2]).ratio()
+                    matches[page_id] = self._match(page_id, score)
+
+        return sorted(matches.values(), key=lambda match: -match.score)[:limit]
+
+    def suggest(self, reference: str, space_keys: Optional[Iterable[str]] = None, limit: int = 3,
+                min_score: float = 0.5) -> List[TitleMatch]:
+        """"Did you mean" candidates for a reference that did not resolve"""
+        return [match for match in self.search(reference, space_keys, limit) if match.score >= min_score]
+
+    def resolve(self, reference: str, space_keys: Optional[Iterable[str]] = None,
+                threshold: float = 0.8) -> Optional[TitleMatch]:
+        """The page a reference names: an exact title, or the only title it is a prefix of
+
+        Prefix matches must score at least `threshold`. Fuzzy matches never resolve
+        ("Page 500" is not "Page 50"); they are offered by `suggest` instead.
+        """
+        normalized = normalize_title(reference)
+        if not normalized:
+            return None
+        spaces = set(space_keys) if space_keys else None
+        with self._lock:
+            matches = sorted(self._prefix_matches(normalized, spaces, limit=2), key=lambda match: -match.score)
+        if matches and (matches[0].score == 1.0 or (len(matches) == 1 and matches[0].score >= threshold)):
+            return matches[0]
+        return None
+
+    def __contains__(self, page_id: str) -> bool:
+        return str(page_id) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+title_catalog = TitleCatalog(refresh_seconds=float(os.environ.get("CONFLUENCE_TITLE_INDEX_REFRESH_SECONDS", 900)))